@@ -0,0 +1,78 @@
+"""Сборка альбомов из отдельных сообщений.
+
+Telegram присылает альбом (одинаковый `media_group_id`) отдельными
+обновлениями, по одному на файл. Чтобы ответить одним `sendMediaGroup`, а не
+десятком одиночных отправок, элементы копятся, пока поток не стихнет на
+`window` секунд (но не дольше `max_delay` от первого элемента), и отдаются
+одним вызовом `flush(items)`.
+
+Повторы одного файла (`file_unique_id`) отбрасываются. Память ограничена:
+в альбоме не больше `max_items` элементов, незавершённых альбомов — не больше
+`max_albums`; самый старый при переполнении выбрасывается.
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Coroutine, Hashable
+
+Flush = Callable[[list[Any]], Awaitable[Any]]
+Spawn = Callable[[Coroutine[Any, Any, Any]], Any]
+
+
+class _Album:
+    __slots__ = ("items", "seen", "flush", "first", "last")
+
+    def __init__(self, flush: Flush, now: float) -> None:
+        self.items: list[Any] = []
+        self.seen: set[str] = set()
+        self.flush = flush
+        self.first = now
+        self.last = now
+
+
+class AlbumBuffer:
+    def __init__(self, window: float = 0.8, max_delay: float = 3.0, max_items: int = 10,
+                 max_albums: int = 1000) -> None:
+        self.window = window
+        self.max_delay = max_delay
+        self.max_items = max_items
+        self.max_albums = max_albums
+        self._albums: OrderedDict[Hashable, _Album] = OrderedDict()
+
+    def add(self, key: Hashable, unique_id: str, item: Any, flush: Flush,
+            spawn: Spawn = asyncio.create_task) -> bool:
+        """Добавляет элемент в альбом `key`. Возвращает False, если он отброшен.
+
+        `flush` запоминается по первому элементу альбома.
+        """
+        now = time.monotonic()
+        album = self._albums.get(key)
+        if album is None:
+            while len(self._albums) >= self.max_albums:
+                dropped, _ = self._albums.popitem(last=False)
+                logging.warning("Альбом %s не дождался отправки: слишком много незавершённых", dropped)
+            album = self._albums[key] = _Album(flush, now)
+            spawn(self._flush_later(key, album))
+        if unique_id in album.seen or len(album.items) >= self.max_items:
+            return False
+        album.seen.add(unique_id)
+        album.items.append(item)
+        album.last = now
+        return True
+
+    async def _flush_later(self, key: Hashable, album: _Album) -> None:
+        while True:
+            if self._albums.get(key) is not album:
+                return  # вытеснен
+            deadline = min(album.last + self.window, album.first + self.max_delay)
+            delay = deadline - time.monotonic()
+            if delay <= 0:
+                break
+            await asyncio.sleep(delay)
+
+        del self._albums[key]
+        try:
+            await album.flush(album.items)
+        except Exception as exc:  # noqa: BLE001 - логируем и продолжаем
+            logging.warning("Не удалось отправить альбом: %s", exc)
@@ -0,0 +1 @@
+"""Офлайн-замеры производительности бота: заглушка Bot API и генератор нагрузки."""
@@ -0,0 +1,187 @@
+"""Локальная заглушка Telegram Bot API.
+
+Понимает ровно те методы, которые вызывает бот, отвечает правдоподобными
+объектами и считает вызовы. Обновления для `getUpdates` подкладывает
+генератор нагрузки через `push_update()`. Можно добавить искусственную
+задержку ответа, долю ответов 429 и ограничить скорость «канала» для
+загрузок файлов, чтобы проверить поведение под давлением.
+"""
+import asyncio
+import itertools
+import json
+import random
+import re
+import time
+from collections import Counter
+from typing import Any
+from urllib.parse import parse_qsl
+
+from http_server import HttpRequest, HttpResponse, HttpServer
+
+BOT_USER = {"id": 100000, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+
+_BOUNDARY = re.compile(r'boundary="?([^";]+)"?')
+_DISPOSITION_PARAM = re.compile(rb'\b(name|filename)="([^"]*)"')
+
+
+def _parse_multipart(content_type: str, body: bytes) -> tuple[dict[str, str], int]:
+    # Разбор на уровне байтов: email.parser на мегабайтных загрузках надолго занимает
+    # общий с ботом цикл событий и искажает замер
+    match = _BOUNDARY.search(content_type)
+    if not match:
+        return {}, 0
+    fields: dict[str, str] = {}
+    uploaded = 0
+    for part in body.split(b"--" + match.group(1).encode())[1:]:
+        headers, sep, payload = part.partition(b"\r\n\r\n")
+        if not sep:
+            continue
+        payload = payload.removesuffix(b"\r\n")
+        params = {k.decode(): v.decode() for k, v in _DISPOSITION_PARAM.findall(headers)}
+        if "filename" in params:
+            uploaded += len(payload)
+        elif "name" in params:
+            fields[params["name"]] = payload.decode()
+    return fields, uploaded
+
+
+def _parse_params(request: HttpRequest) -> tuple[dict[str, Any], int]:
+    """Параметры запроса PTB: form-urlencoded или multipart. Второе значение — байты файлов."""
+    content_type = request.headers.get("content-type", "")
+    fields: dict[str, str] = {}
+    uploaded = 0
+    if content_type.startswith("multipart/form-data"):
+        fields, uploaded = _parse_multipart(content_type, request.body)
+    elif request.body:
+        fields = dict(parse_qsl(request.body.decode(), keep_blank_values=True))
+    params: dict[str, Any] = {}
+    for key, value in fields.items():
+        try:
+            params[key] = json.loads(value)
+        except ValueError:
+            params[key] = value
+    return params, uploaded
+
+
+class FakeBotApi:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0,
+                 flood_ratio: float = 0.0, upload_bandwidth: float = 0.0) -> None:
+        self.latency = latency
+        self.flood_ratio = flood_ratio
+        # Байт в секунду для тела загрузки; 0 — без ограничения
+        self.upload_bandwidth = upload_bandwidth
+        self.server = HttpServer(self._handle, host, port)
+        self.calls: Counter[str] = Counter()
+        self.bytes_uploaded = 0
+        self.errors = 0
+        self._message_ids = itertools.count(1)
+        self._updates: list[dict[str, Any]] = []
+        self._update_ids = itertools.count(1)
+        self._new_updates = asyncio.Event()
+        # update_id → момент, когда обновление стало доступно боту
+        self.pushed_at: dict[int, float] = {}
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server.bound_port}/bot"
+
+    async def start(self) -> None:
+        await self.server.start()
+
+    async def stop(self) -> None:
+        self._new_updates.set()
+        await self.server.stop(timeout=1)
+
+    def push_update(self, update: dict[str, Any]) -> int:
+        update_id = next(self._update_ids)
+        update["update_id"] = update_id
+        self._updates.append(update)
+        self.pushed_at[update_id] = time.perf_counter()
+        self._new_updates.set()
+        return update_id
+
+    @property
+    def backlog(self) -> int:
+        return len(self._updates)
+
+    def reset_counters(self) -> None:
+        self.calls.clear()
+        self.bytes_uploaded = 0
+        self.errors = 0
+
+    async def _handle(self, request: HttpRequest) -> HttpResponse:
+        # /bot<token>/<method>
+        method = request.path.rsplit("/", 1)[-1]
+        params, uploaded = _parse_params(request)
+        if method == "getUpdates":
+            result = await self._get_updates(params)
+            return self._ok(result)
+
+        self.calls[method] += 1
+        self.bytes_uploaded += uploaded
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if uploaded and self.upload_bandwidth:
+            await asyncio.sleep(uploaded / self.upload_bandwidth)
+        if self.flood_ratio and random.random() < self.flood_ratio:
+            self.errors += 1
+            return HttpResponse(429, json.dumps({
+                "ok": False, "error_code": 429, "description": "Too Many Requests: retry after 1",
+                "parameters": {"retry_after": 1},
+            }).encode())
+        return self._ok(self._result_for(method, params))
+
+    @staticmethod
+    def _ok(result: Any) -> HttpResponse:
+        return HttpResponse(200, json.dumps({"ok": True, "result": result}, ensure_ascii=False).encode())
+
+    async def _get_updates(self, params: dict[str, Any]) -> list[dict[str, Any]]:
+        offset = int(params.get("offset") or 0)
+        if offset:
+            self._updates = [u for u in self._updates if u["update_id"] >= offset]
+        timeout = float(params.get("timeout") or 0)
+        if not self._updates and timeout:
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        limit = int(params.get("limit") or 100)
+        return self._updates[:limit]
+
+    def _message(self, chat_id: Any, **extra: Any) -> dict[str, Any]:
+        chat_id = int(chat_id) if str(chat_id).lstrip("-").isdigit() else 0
+        return {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private" if chat_id > 0 else "group"},
+            "from": BOT_USER,
+            **extra,
+        }
+
+    def _photo(self) -> list[dict[str, Any]]:
+        n = next(self._message_ids)
+        return [{"file_id": f"photo-{n}", "file_unique_id": f"u-{n}", "width": 1280, "height": 960}]
+
+    def _result_for(self, method: str, params: dict[str, Any]) -> Any:
+        chat_id = params.get("chat_id", 0)
+        if method == "getMe":
+            return BOT_USER
+        if method == "sendMessage":
+            return self._message(chat_id, text=params.get("text", ""))
+        if method == "sendPhoto":
+            return self._message(chat_id, photo=self._photo(), caption=params.get("caption"))
+        if method == "sendDocument":
+            document = {"file_id": "doc", "file_unique_id": "doc-u", "file_name": "file.pdf"}
+            return self._message(chat_id, document=document)
+        if method == "sendMediaGroup":
+            media = params.get("media") or []
+            return [self._message(chat_id, photo=self._photo(), media_group_id="g") for _ in media]
+        if method in ("editMessageReplyMarkup", "editMessageText"):
+            if "inline_message_id" in params:
+                return True
+            return self._message(chat_id, text="edited")
+        if method == "getMyCommands":
+            return []
+        # answerCallbackQuery, setMyCommands, deleteWebhook, deleteMessage(s) и прочее
+        return True
@@ -0,0 +1,348 @@
+"""Нагрузочный прогон бота без сети и без настоящего токена.
+
+    python -m bench.load --rates 25,50,100,200 --duration 10 --out bench_results.json
+
+Бот из bot.py запускается как обычно (polling), но ходит в локальную
+заглушку Bot API. Генератор с заданной частотой подкладывает смесь
+обновлений: /start, прохождение квиза (/design, нажатия категорий, «Готово»),
+фото и документы. Для каждой ступени частоты считаются p50/p95/p99 задержки
+(от появления обновления в getUpdates до конца обработки), время работы
+обработчиков (в том числе по видам обновлений), число вызовов API на обновление.
+Итог — максимальная частота,
+которую бот выдерживает, и JSON-отчёт для сравнения релизов.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any
+
+from bench.fake_bot_api import BOT_USER, FakeBotApi
+
+# Доли типов обновлений в смеси по умолчанию
+DEFAULT_MIX = {"start": 0.25, "quiz": 0.45, "photo": 0.15, "document": 0.15}
+
+
+def _percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def _summary_ms(values: list[float]) -> dict[str, float]:
+    return {
+        "p50": round(_percentile(values, 0.50) * 1000, 2),
+        "p95": round(_percentile(values, 0.95) * 1000, 2),
+        "p99": round(_percentile(values, 0.99) * 1000, 2),
+        "max": round(max(values) * 1000, 2) if values else 0.0,
+    }
+
+
+def _make_slides(root: Path) -> None:
+    """Синтетические слайды: по 6/4/1 картинке, как в реальной раскладке."""
+    counts = {"kitchen": 6, "living": 4, "wardrobe": 4, "cabinets": 4, "library": 4, "other": 1}
+    try:
+        from PIL import Image
+    except ImportError:
+        Image = None
+    for code, n in counts.items():
+        (root / code).mkdir(parents=True, exist_ok=True)
+        for i in range(1, n + 1):
+            path = root / code / f"{code}_{i}.jpg"
+            if path.exists():
+                continue
+            if Image is not None:
+                Image.new("RGB", (1600, 1200), (i * 30 % 255, 120, 200)).save(path, quality=90)
+            else:
+                path.write_bytes(os.urandom(200_000))
+
+
+class TrafficGenerator:
+    """Синтетические пользователи и их обновления."""
+
+    def __init__(self, users: int, mix: dict[str, float], seed: int = 1) -> None:
+        self.rng = random.Random(seed)
+        self.user_ids = list(range(1_000_001, 1_000_001 + users))
+        self.mix_kinds = list(mix)
+        self.mix_weights = [mix[k] for k in self.mix_kinds]
+        self.categories = ["kitchen", "living", "wardrobe", "cabinets", "library", "other"]
+        # user_id → сколько ещё нажатий в квизе до «Готово»
+        self.quiz_left: dict[int, int] = {}
+        self._message_id = 0
+        self.kinds: Counter[str] = Counter()
+
+    def _user(self, user_id: int) -> dict[str, Any]:
+        return {"id": user_id, "is_bot": False, "first_name": f"User{user_id % 1000}"}
+
+    def _message(self, user_id: int, **extra: Any) -> dict[str, Any]:
+        self._message_id += 1
+        return {
+            "message_id": self._message_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": self._user(user_id),
+            **extra,
+        }
+
+    def _command(self, user_id: int, command: str) -> dict[str, Any]:
+        text = f"/{command}"
+        entities = [{"type": "bot_command", "offset": 0, "length": len(text)}]
+        return {"message": self._message(user_id, text=text, entities=entities)}
+
+    def _callback(self, user_id: int, data: str) -> dict[str, Any]:
+        # Нажатие приходит на сообщение бота с клавиатурой квиза
+        message = self._message(user_id, text="quiz") | {"from": BOT_USER}
+        return {"callback_query": {
+            "id": str(self.rng.getrandbits(48)),
+            "from": self._user(user_id),
+            "chat_instance": str(user_id),
+            "data": data,
+            "message": message,
+        }}
+
+    def next_update(self) -> tuple[str, dict[str, Any]]:
+        kind = self.rng.choices(self.mix_kinds, self.mix_weights)[0]
+        user_id = self.rng.choice(self.user_ids)
+        if kind == "quiz":
+            # Продолжаем квиз у тех, кто его начал, иначе начинаем новый
+            if self.quiz_left and self.rng.random() < 0.8:
+                user_id = self.rng.choice(list(self.quiz_left))
+            left = self.quiz_left.get(user_id)
+            if left is None:
+                self.quiz_left[user_id] = self.rng.randint(1, 4)
+                update = self._command(user_id, "design")
+                kind = "design"
+            elif left > 0:
+                self.quiz_left[user_id] = left - 1
+                update = self._callback(user_id, f"cat:{self.rng.choice(self.categories)}")
+                kind = "toggle"
+            else:
+                del self.quiz_left[user_id]
+                update = self._callback(user_id, "cat_done")
+                kind = "done"
+        elif kind == "start":
+            update = self._command(user_id, "start")
+        elif kind == "photo":
+            n = self._message_id
+            photo = [{"file_id": f"in-{n}", "file_unique_id": f"inu-{n}", "width": 800, "height": 600}]
+            update = {"message": self._message(user_id, photo=photo, caption="моя кухня")}
+        else:
+            document = {"file_id": "in-doc", "file_unique_id": "in-doc-u", "file_name": "plan.pdf"}
+            update = {"message": self._message(user_id, document=document)}
+        self.kinds[kind] += 1
+        return kind, update
+
+
+class BenchRun:
+    def __init__(self, args: argparse.Namespace) -> None:
+        self.args = args
+        self.api = FakeBotApi(latency=args.api_latency / 1000, flood_ratio=args.flood_ratio,
+                              upload_bandwidth=args.upload_kbps * 1000 / 8)
+        self.latencies: list[float] = []
+        # update_id → вид обновления; задержки по видам показывают, кто кого ждёт
+        self.kind_of: dict[int, str] = {}
+        self.latencies_by_kind: dict[str, list[float]] = {}
+        self.handler_times: list[float] = []
+        self.processed = 0
+        self.handler_errors = 0
+        # Наблюдатель, который поставил сам бот (например, метрики)
+        self._chained: Any = None
+
+    def _on_processed(self, update: object, started: float, finished: float) -> None:
+        update_id = getattr(update, "update_id", None)
+        pushed = self.api.pushed_at.pop(update_id, None)
+        if pushed is not None:
+            self.latencies.append(finished - pushed)
+            kind = self.kind_of.pop(update_id, "other")
+            self.latencies_by_kind.setdefault(kind, []).append(finished - pushed)
+        self.handler_times.append(finished - started)
+        self.processed += 1
+        if self._chained is not None:
+            self._chained(update, started, finished)
+
+    async def _on_error(self, update: object, context: Any) -> None:
+        self.handler_errors += 1
+
+    async def run(self) -> dict[str, Any]:
+        import bot  # импорт после настройки окружения
+
+        _make_slides(bot.SLIDES.root)
+        await asyncio.to_thread(bot.SLIDES.reload)
+        if self.args.no_file_id_cache:
+            # Каждый показ слайдов — настоящая загрузка файлов
+            bot.FILE_IDS.get = lambda digest: None
+
+        await self.api.start()
+        app = bot.build_application(os.environ["BOT_TOKEN"], base_url=self.api.base_url)
+        self._chained = app.update_processor.on_processed
+        app.update_processor.on_processed = self._on_processed
+        app.add_error_handler(self._on_error)
+
+        started = time.perf_counter()
+        await app.initialize()
+        if app.post_init:
+            await app.post_init(app)
+        await app.updater.start_polling(poll_interval=0.0, timeout=1)
+        await app.start()
+        startup = time.perf_counter() - started
+
+        generator = TrafficGenerator(self.args.users, DEFAULT_MIX, seed=self.args.seed)
+        steps = []
+        try:
+            for rate in self.args.rates:
+                steps.append(await self._step(generator, rate))
+        finally:
+            await app.updater.stop()
+            await app.stop()
+            if app.post_stop:
+                await app.post_stop(app)
+            await app.shutdown()
+            if app.post_shutdown:
+                await app.post_shutdown(app)
+            await self.api.stop()
+
+        sustained = [s["target_rate"] for s in steps if s["sustained"]]
+        return {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "config": {
+                "duration_per_step_s": self.args.duration,
+                "users": self.args.users,
+                "api_latency_ms": self.args.api_latency,
+                "flood_ratio": self.args.flood_ratio,
+                "max_p95_ms": self.args.max_p95,
+                "upload_kbps": self.args.upload_kbps,
+                "file_id_cache": not self.args.no_file_id_cache,
+                "mix": DEFAULT_MIX,
+                "max_concurrent_updates": bot.MAX_CONCURRENT_UPDATES,
+                "send_global_rate": bot.SEND_SCHEDULER.global_rate,
+                "http_pool_size": bot.HTTP_POOL.size,
+                "http_upload_pool_size": bot.HTTP_UPLOAD_POOL.size,
+                "http2": bot.HTTP2,
+            },
+            "startup_s": round(startup, 4),
+            "steps": steps,
+            "max_sustained_updates_per_sec": max(sustained) if sustained else 0,
+        }
+
+    async def _step(self, generator: TrafficGenerator, rate: float) -> dict[str, Any]:
+        self.latencies.clear()
+        self.handler_times.clear()
+        self.processed = 0
+        self.handler_errors = 0
+        self.latencies_by_kind.clear()
+        self.api.reset_counters()
+        generator.kinds.clear()
+
+        interval = 1.0 / rate
+        sent = 0
+        began = time.perf_counter()
+        deadline = began + self.args.duration
+        next_at = began
+        while True:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            # Догоняем расписание пачкой, если цикл не успевает
+            while next_at <= now:
+                kind, update = generator.next_update()
+                self.kind_of[self.api.push_update(update)] = kind
+                sent += 1
+                next_at += interval
+            await asyncio.sleep(min(interval, max(0.0, next_at - time.perf_counter())))
+        send_window = time.perf_counter() - began
+
+        # Даём дообработать хвост
+        drain_deadline = time.perf_counter() + self.args.drain
+        while self.processed < sent and time.perf_counter() < drain_deadline:
+            await asyncio.sleep(0.05)
+        elapsed = time.perf_counter() - began
+
+        api_calls = sum(self.api.calls.values())
+        latency = _summary_ms(self.latencies)
+        achieved = self.processed / elapsed if elapsed else 0.0
+        sustained = (
+            self.processed >= sent
+            and latency["p95"] <= self.args.max_p95
+            and self.handler_errors == 0
+        )
+        return {
+            "target_rate": rate,
+            "updates_sent": sent,
+            "updates_processed": self.processed,
+            "send_window_s": round(send_window, 3),
+            "achieved_updates_per_sec": round(achieved, 2),
+            "latency_ms": latency,
+            "latency_ms_by_kind": {k: _summary_ms(v) for k, v in sorted(self.latencies_by_kind.items())},
+            "handler_ms": _summary_ms(self.handler_times),
+            "api_calls": api_calls,
+            "api_calls_per_update": round(api_calls / self.processed, 3) if self.processed else 0.0,
+            "api_calls_by_method": dict(self.api.calls),
+            "api_bytes_uploaded": self.api.bytes_uploaded,
+            "api_429_injected": self.api.errors,
+            "handler_errors": self.handler_errors,
+            "update_kinds": dict(generator.kinds),
+            "sustained": sustained,
+        }
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rates", default="25,50,100,200,400",
+                        help="ступени частоты обновлений в секунду, через запятую")
+    parser.add_argument("--duration", type=float, default=10.0, help="длительность ступени, с")
+    parser.add_argument("--drain", type=float, default=10.0, help="сколько ждать хвост после ступени, с")
+    parser.add_argument("--users", type=int, default=500, help="число синтетических пользователей")
+    parser.add_argument("--api-latency", type=float, default=0.0, help="задержка ответа заглушки API, мс")
+    parser.add_argument("--flood-ratio", type=float, default=0.0, help="доля ответов 429 от заглушки")
+    parser.add_argument("--upload-kbps", type=float, default=0.0,
+                        help="скорость загрузки файлов в заглушку, кбит/с (0 — без ограничения)")
+    parser.add_argument("--no-file-id-cache", action="store_true",
+                        help="не использовать кэш file_id: слайды загружаются при каждом показе")
+    parser.add_argument("--max-p95", type=float, default=1000.0,
+                        help="порог p95 задержки (мс), при котором ступень считается выдержанной")
+    parser.add_argument("--telegram-limits", action="store_true",
+                        help="оставить лимиты отправки как у Telegram (по умолчанию сняты)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="файл для JSON-отчёта (по умолчанию stdout)")
+    args = parser.parse_args(argv)
+    args.rates = [float(r) for r in args.rates.split(",") if r]
+    return args
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = parse_args(argv)
+    saved_env = dict(os.environ)
+    with tempfile.TemporaryDirectory(prefix="bot-bench-") as tmp:
+        # Бот читает настройки при импорте — задаём их до `import bot` в BenchRun.run
+        os.environ.setdefault("BOT_TOKEN", "123456:BENCH")
+        os.environ.setdefault("DATA_DIR", str(Path(tmp) / "data"))
+        os.environ.setdefault("SLIDES_DIR", str(Path(tmp) / "slides"))
+        os.environ.setdefault("SLIDES_REFRESH_INTERVAL", "0")
+        if not args.telegram_limits:
+            # Меряем сам бот, а не лимиты Telegram
+            os.environ.setdefault("SEND_GLOBAL_RATE", "100000")
+            os.environ.setdefault("SEND_CHAT_RATE", "100000")
+            os.environ.setdefault("SEND_GROUP_RATE_PER_MIN", "6000000")
+        try:
+            report = asyncio.run(BenchRun(args).run())
+        finally:
+            os.environ.clear()
+            os.environ.update(saved_env)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        Path(args.out).write_text(text + "\n", encoding="utf-8")
+    else:
+        sys.stdout.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Замер времени запуска бота: от старта процесса до первого обработанного обновления.
+
+    python -m bench.startup --runs 5 --out startup.json
+
+Каждый прогон — отдельный процесс Python (чтобы честно посчитать импорты),
+который поднимает локальную заглушку Bot API, запускает бот в режиме polling
+и ждёт ответа на `/start`. Все прогоны используют общий DATA_DIR, как при
+обычном рестарте: первый прогон — «холодный», остальные — повторные запуски.
+В отчёте по каждому прогону: время импорта `bot`, `initialize` + `post_init`,
+время до первого обработанного обновления и число вызовов `setMyCommands`.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+_CHILD_FLAG = "--child"
+
+
+async def _child() -> dict[str, Any]:
+    started = time.perf_counter()
+    import bot  # импорт — часть замера
+    imported = time.perf_counter()
+
+    from bench.fake_bot_api import FakeBotApi
+
+    api = FakeBotApi()
+    await api.start()
+    app = bot.build_application(os.environ["BOT_TOKEN"], base_url=api.base_url)
+    first_update = asyncio.get_running_loop().create_future()
+
+    def _on_processed(update: object, _started: float, finished: float) -> None:
+        if not first_update.done():
+            first_update.set_result(finished)
+
+    app.update_processor.on_processed = _on_processed
+
+    await app.initialize()
+    if app.post_init:
+        await app.post_init(app)
+    initialized = time.perf_counter()
+    await app.updater.start_polling(poll_interval=0.0, timeout=1)
+    await app.start()
+
+    user = {"id": 42, "is_bot": False, "first_name": "Bench"}
+    api.push_update({"message": {
+        "message_id": 1, "date": int(time.time()), "chat": {"id": 42, "type": "private"}, "from": user,
+        "text": "/start", "entities": [{"type": "bot_command", "offset": 0, "length": 6}],
+    }})
+    handled = await asyncio.wait_for(first_update, timeout=30)
+    set_my_commands = api.calls["setMyCommands"]
+
+    await app.updater.stop()
+    await app.stop()
+    await app.shutdown()
+    if app.post_shutdown:
+        await app.post_shutdown(app)
+    await api.stop()
+    return {
+        "import_ms": round((imported - started) * 1000, 1),
+        "init_ms": round((initialized - imported) * 1000, 1),
+        "first_update_ms": round((handled - started) * 1000, 1),
+        "set_my_commands_calls": set_my_commands,
+    }
+
+
+def _run_once(env: dict[str, str]) -> dict[str, Any]:
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-m", "bench.startup", _CHILD_FLAG],
+        env=env, capture_output=True, text=True, check=False,
+        cwd=Path(__file__).resolve().parent.parent,
+    )
+    wall = time.perf_counter() - started
+    if proc.returncode != 0:
+        raise RuntimeError(f"прогон завершился с кодом {proc.returncode}:\n{proc.stderr[-2000:]}")
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["process_ms"] = round(wall * 1000, 1)
+    return result
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="сколько раз запустить бот")
+    parser.add_argument("--out", help="файл для JSON-отчёта (по умолчанию stdout)")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> None:
+    if argv is None and sys.argv[1:] == [_CHILD_FLAG]:
+        print(json.dumps(asyncio.run(_child())))
+        return
+    args = parse_args(argv)
+
+    from bench.load import _make_slides
+
+    with tempfile.TemporaryDirectory(prefix="bot-startup-") as tmp_dir:
+        tmp = Path(tmp_dir)
+        _make_slides(tmp / "slides")
+        env = {
+            **os.environ,
+            "BOT_TOKEN": "123456:BENCH",
+            "DATA_DIR": str(tmp / "data"),
+            "SLIDES_DIR": str(tmp / "slides"),
+            "SLIDES_REFRESH_INTERVAL": "0",
+            "CONTENT_REFRESH_INTERVAL": "0",
+        }
+        runs = [_run_once(env) for _ in range(args.runs)]
+    warm = runs[1:] or runs
+    report = {
+        "python": sys.version.split()[0],
+        "runs": runs,
+        "cold_first_update_ms": runs[0]["first_update_ms"],
+        "warm_first_update_ms_median": statistics.median(r["first_update_ms"] for r in warm),
+        "warm_process_ms_median": statistics.median(r["process_ms"] for r in warm),
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        Path(args.out).write_text(text + "\n", encoding="utf-8")
+    else:
+        sys.stdout.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
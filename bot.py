@@ -1,104 +1,301 @@
 import os
+import json
+import asyncio
+import functools
+import hashlib
 import logging
+import time
 from pathlib import Path
+from typing import Mapping
+import httpx
 from dotenv import load_dotenv
-from telegram import Update, BotCommand, InlineKeyboardButton, InlineKeyboardMarkup, FSInputFile, InputMediaPhoto
+from telegram import Update, BotCommand, InlineKeyboardButton, InlineKeyboardMarkup, InputMediaPhoto, InputMediaDocument, InputFile, Bot, Message
+from telegram.constants import ChatType
 from telegram.ext import Application, CommandHandler, ContextTypes, MessageHandler, filters, CallbackQueryHandler
 
+import logging_setup
+import metrics
+from album_buffer import AlbumBuffer
+from config import CONFIG_ERRORS, check_config, env_ids, env_number
+from content import Command, Content, ContentRegistry, addressed_to_other_bot, command_name
+from edit_coalescer import EditCoalescer
+from file_id_cache import FileIdCache
+from intent_router import IntentRouter, Route
+from lead_store import EXPORT_FORMATS, LeadStore
+from slide_catalog import SlideCatalog
+from send_scheduler import SendScheduler
+from session_store import SqlitePersistence
+from slide_derivatives import SlideDerivatives
+from transport import PoolConfig, RoutingRequest, http_request
+from update_processor import PerChatUpdateProcessor
+from webhook import WebhookConfig, parse_mode, run_webhook
+
 # Загрузить переменные окружения из .env
 load_dotenv()
 
-# Настройка логирования
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
+# Читаем токен из переменной окружения (проверяется в main)
+BOT_TOKEN = os.getenv("BOT_TOKEN")
+
+# Пользователи, которым доступны служебные команды (через запятую)
+ADMIN_IDS: frozenset[int] = env_ids("ADMIN_IDS")
+
+# Логи: формат (text или json), уровень и прореживание однотипных записей (см. logging_setup.py).
+# Обработчики логов ставит main(), а не импорт модуля.
+LOG_SETTINGS = logging_setup.LogSettings.from_env()
+
+# Каталог для служебных данных бота (кэши, базы)
+DATA_DIR = Path(os.getenv("DATA_DIR") or Path(__file__).resolve().parent / "data")
+
+# Служебный чат, куда при старте заливаются слайды без file_id (необязательно)
+WARMUP_CHAT_ID = env_number("WARMUP_CHAT_ID", "0", int) or None
+
+# Все исходящие запросы идут через общий планировщик с лимитами Telegram
+SEND_SCHEDULER = SendScheduler(
+    global_rate=env_number("SEND_GLOBAL_RATE", "30"),
+    chat_rate=env_number("SEND_CHAT_RATE", "1"),
+    group_rate=env_number("SEND_GROUP_RATE_PER_MIN", "20") / 60,
 )
 
-# Читаем токен из переменной окружения
-BOT_TOKEN = os.getenv("BOT_TOKEN")
+# HTTP-клиенты Bot API (см. transport.py): интерактивные ответы, загрузки файлов и getUpdates
+# ходят через разные пулы соединений, чтобы большой альбом не задерживал ответ на кнопку
+HTTP_KEEPALIVE_SECONDS = env_number("HTTP_KEEPALIVE_SECONDS", "30")
+HTTP2 = os.getenv("HTTP2", "").lower() in ("1", "true", "yes")
+HTTP_CONNECT_TIMEOUT = env_number("HTTP_CONNECT_TIMEOUT", "5")
+HTTP_POOL = PoolConfig(
+    size=env_number("HTTP_POOL_SIZE", "256", int),
+    timeout=env_number("HTTP_TIMEOUT", "5"),
+    connect_timeout=HTTP_CONNECT_TIMEOUT,
+    keepalive=HTTP_KEEPALIVE_SECONDS,
+    http2=HTTP2,
+)
+HTTP_UPLOAD_POOL = PoolConfig(
+    size=env_number("HTTP_UPLOAD_POOL_SIZE", "8", int),
+    timeout=env_number("HTTP_UPLOAD_TIMEOUT", "60"),
+    connect_timeout=HTTP_CONNECT_TIMEOUT,
+    # Загрузки дольше, поэтому и свободного соединения разумно ждать дольше
+    pool_timeout=env_number("HTTP_UPLOAD_POOL_TIMEOUT", "30"),
+    keepalive=HTTP_KEEPALIVE_SECONDS,
+    http2=HTTP2,
+)
+# Одно соединение под long polling; к таймауту чтения PTB сам прибавляет timeout опроса
+HTTP_POLLING_POOL = PoolConfig(
+    size=1,
+    timeout=HTTP_POOL.timeout,
+    connect_timeout=HTTP_CONNECT_TIMEOUT,
+    keepalive=HTTP_KEEPALIVE_SECONDS,
+    http2=HTTP2,
+)
 
-if not BOT_TOKEN:
-    raise RuntimeError("Не найден BOT_TOKEN. Убедитесь, что в файле .env есть строка BOT_TOKEN=\"ВАШ_ТОКЕН\"")
+# Сколько обновлений обрабатывать одновременно (внутри одного чата — всегда по очереди)
+MAX_CONCURRENT_UPDATES = env_number("MAX_CONCURRENT_UPDATES", "64", int)
+
+# Пауза (в секундах) после последнего нажатия в квизе, после которой обновляется клавиатура
+TOGGLE_SETTLE_SECONDS = env_number("TOGGLE_SETTLE_SECONDS", "0.4")
+
+# Как часто (в секундах) проверять папки слайдов на изменения; 0 — не проверять
+SLIDES_REFRESH_INTERVAL = env_number("SLIDES_REFRESH_INTERVAL", "30")
+
+# Сессии пользователей (выбор в квизе и т. п.) переживают перезапуск; неактивные
+# дольше SESSION_TTL_HOURS удаляются (0 — не удалять). Изменения пишутся на диск
+# пачкой раз в SESSION_FLUSH_INTERVAL секунд.
+SESSION_TTL_HOURS = env_number("SESSION_TTL_HOURS", "72")
+if SESSION_TTL_HOURS < 0:
+    CONFIG_ERRORS.append(f"SESSION_TTL_HOURS={SESSION_TTL_HOURS}: ожидается 0 или больше")
+PERSISTENCE = SqlitePersistence(
+    DATA_DIR / "sessions.sqlite3",
+    ttl=SESSION_TTL_HOURS * 3600,
+    update_interval=env_number("SESSION_FLUSH_INTERVAL", "5"),
+)
+
+# Заявки (замер, расчёт, шоурум) пишутся в фоне пачками; выгрузка — /export_leads
+LEADS = LeadStore(DATA_DIR / "leads.sqlite3")
+
+# Длиннее этого ответ на вопрос заявки обрезается
+MAX_LEAD_ANSWER = 1000
+
+# Тексты команд, меню и категории квиза (см. content.json); файл перечитывается на лету
+CONTENT = ContentRegistry(Path(os.getenv("CONTENT_FILE") or Path(__file__).resolve().parent / "content.json"))
+
+# Как часто (в секундах) проверять content.json на изменения; 0 — не проверять
+CONTENT_REFRESH_INTERVAL = env_number("CONTENT_REFRESH_INTERVAL", "5")
+
+# Сколько ждать (в секундах) следующий файл альбома, прежде чем ответить на альбом целиком
+ALBUM_WINDOW_SECONDS = env_number("ALBUM_WINDOW_SECONDS", "0.8")
 
 def build_welcome_text(first_name: str | None) -> str:
-    user_name = first_name or "друг"
-    return (
-        f"🏠 Добро пожаловать в мебельную студию Еврособа, {user_name}!\n\n"
-        "Мы создаем премиальную мебель на заказ для тех, кто ценит качество, стиль и индивидуальный подход.\n\n"
-        "🎯 Что вас интересует?\n\n"
-        "📏 Заказать профессиональный замер — /measure\n"
-        "💰 Узнать стоимость проекта — /price\n"
-        "🎨 Запросить дизайн-проект — /design\n"
-        "📸 Посмотреть портфолио работ — /portfolio\n"
-        "🏢 Записаться в шоурум — /showroom\n"
-        "📞 Получить контакты — /contacts\n"
-        "🤖 Умный помощник (ответит на любой вопрос) — /help\n\n"
-        "💬 Или просто опишите ваш проект — я пойму и помогу выбрать лучший вариант!"
-    )
+    return CONTENT.current.reply("start", first_name)
 
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Обработчик команды /start"""
     if not update.message:
         return
+    context.user_data.pop("lead", None)
     text = build_welcome_text(update.effective_user.first_name if update.effective_user else None)
     await update.message.reply_text(text)
 
 
+def _addressed_to_other_bot(message: Message) -> bool:
+    return addressed_to_other_bot(message.text, message.get_bot().username)
+
+
 async def on_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Единый обработчик для текстовых команд."""
+    """Единый обработчик для команд из content.json."""
     if not update.message:
         return
-    cmd = update.message.text.lstrip("/").split()[0]
-    # Сопоставляем с теми же текстами, что и для кнопок
-    mapping = {
-        "measure": "📏 Профессиональный замер: оставьте адрес и удобное время, мы свяжемся.",
-        "price": "💲 Стоимость проекта: опишите задачу и материалы — рассчитаем смету.",
-        "portfolio": "📸 Портфолио: отправлю примеры работ и проекты похожие на ваш.",
-        "showroom": "🏢 Шоурум: адрес и часы работы. Хотите записаться на визит?",
-        "contacts": "📞 Контакты: телефон, WhatsApp, email. Чем удобно связаться?",
-        "help": "🤖 Задайте любой вопрос — постараюсь помочь!",
-        "start": build_welcome_text(update.effective_user.first_name if update.effective_user else None),
-    }
-    if cmd == "design":
+    content = CONTENT.current
+    command = content.commands.get(command_name(update.message.text))
+    if command is None or _addressed_to_other_bot(update.message):
+        return
+    # Любая команда прерывает начатую заявку
+    context.user_data.pop("lead", None)
+    if command.action == "quiz":
         # Для /design запускаем квиз с выбором категорий
         await design_quiz(update, context)
         return
-    reply = mapping.get(cmd, "Команда не распознана. Нажмите кнопку ниже или отправьте /start.")
-    # Для всех команд просто отправляем текст
-    await update.message.reply_text(reply)
+    first_name = update.effective_user.first_name if update.effective_user else None
+    if command.lead:
+        if update.message.chat.type != ChatType.PRIVATE:
+            # Ответы собирает on_text только в личке, а user_data общий для всех чатов пользователя
+            await update.message.reply_text(f"{content.reply(command.name, first_name)}\n\n{content.lead_private_only}")
+            return
+        await _start_lead(update.message, context, content, command, first_name)
+        return
+    # Для всех остальных команд просто отправляем текст
+    await update.message.reply_text(content.reply(command.name, first_name))
+
+
+async def _start_lead(message: Message, context: ContextTypes.DEFAULT_TYPE, content: Content,
+                      command: Command, first_name: str | None) -> None:
+    """Ответ команды и первый вопрос заявки; ответы собирает on_text."""
+    context.user_data["lead"] = {"command": command.name, "answers": {}}
+    await message.reply_text(f"{content.reply(command.name, first_name)}\n\n{command.lead[0].prompt}")
+
+
+async def _continue_lead(update: Update, context: ContextTypes.DEFAULT_TYPE, content: Content) -> bool:
+    """Принимает ответ на очередной вопрос заявки. False — заявка не начата."""
+    lead = context.user_data.get("lead")
+    if not lead:
+        return False
+    message = update.message
+    command = content.commands.get(lead["command"])
+    answers: dict[str, str] = lead["answers"]
+    if command is None or len(answers) >= len(command.lead):
+        # Вопросы убрали из content.json, пока пользователь отвечал
+        context.user_data.pop("lead", None)
+        return False
+    answers[command.lead[len(answers)].key] = message.text[:MAX_LEAD_ANSWER]
+    if len(answers) < len(command.lead):
+        await message.reply_text(command.lead[len(answers)].prompt)
+        return True
+    context.user_data.pop("lead", None)
+    user = update.effective_user
+    LEADS.add(
+        command.name, answers, user_id=user.id if user else None, chat_id=message.chat_id,
+        username=user.username if user else None, first_name=user.first_name if user else None,
+    )
+    await message.reply_text(content.lead_done.render((user.first_name if user else None) or content.default_name))
+    return True
+
+
+_ROUTER: IntentRouter | None = None
+
+
+def _intent_router(content: Content) -> IntentRouter:
+    """Индекс ключевых слов для данной версии content.json (пересобирается при её замене)."""
+    global _ROUTER
+    if _ROUTER is None or _ROUTER.content is not content:
+        _ROUTER = IntentRouter(content)
+    return _ROUTER
+
+
+def _free_text_reply(content: Content, route: Route | None, first_name: str | None) -> str | None:
+    """Текстовый ответ на свободное сообщение или None, если нужен квиз или заявка."""
+    if route is None:
+        return content.free_text_fallback
+    if route.command not in content.text_commands:
+        return None
+    return content.reply(route.command, first_name)
+
+
+async def on_text(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Свободный текст в личке: ответ по теме или квиз с уже отмеченными категориями."""
+    message = update.message
+    if not message or not message.text:
+        return
+    content = CONTENT.current
+    if await _continue_lead(update, context, content):
+        return
+    route = _intent_router(content).route(message.text)
+    first_name = update.effective_user.first_name if update.effective_user else None
+    text = _free_text_reply(content, route, first_name)
+    if text is not None:
+        await message.reply_text(text)
+        return
+    command = content.commands.get(route.command) if route.command else None
+    if command is not None and command.lead:
+        await _start_lead(message, context, content, command, first_name)
+        return
+    _ensure_category_keyboards()
+    selected = 0
+    for code in route.categories:
+        selected |= CATEGORY_BITS.get(code, 0)
+    await design_quiz(update, context, selected)
+
+
+def inline_reply(update: Update, user_data: Mapping[int, dict]) -> dict | None:
+    """Ответ на простую команду в формате тела вебхука, иначе None.
+
+    `user_data` — `Application.user_data`: по нему видно, нет ли у пользователя
+    начатой заявки (main() подставляет его через functools.partial).
+    """
+    message = update.message
+    if not message or not message.text:
+        return None
+    content = CONTENT.current
+    cmd = command_name(message.text)
+    # В теле ответа можно отправить только текстовые команды. Свободный текст
+    # сюда не попадает: он может быть ответом на вопрос заявки, а user_data здесь нет.
+    if cmd not in content.text_commands or _addressed_to_other_bot(message):
+        return None
+    user = update.effective_user
+    if user and (not PERSISTENCE.loaded(user.id) or user_data.get(user.id, {}).get("lead")):
+        # Команда должна прервать заявку, а это делает обработчик из очереди. Сессия
+        # подгружается с первым обновлением пользователя после перезапуска — до этого
+        # о заявке ничего не известно, и первую команду тоже отдаём обработчику
+        return None
+    first_name = user.first_name if user else None
+    return {"method": "sendMessage", "chat_id": message.chat_id, "text": content.reply(cmd, first_name)}
 
 
 # =============================
 # Квиз: выбор категорий и слайдов
 # =============================
 
-# Коды категорий и отображаемые названия
-CATEGORY_DISPLAY: dict[str, str] = {
-    "kitchen": "🍽 КУХНЯ",
-    "living": "🛋 ГОСТИНАЯ",
-    "wardrobe": "🧥 ГАРДЕРОБНАЯ",
-    "cabinets": "📚 ШКАФЫ",
-    "library": "📖 БИБЛИОТЕКА",
-    "other": "✏️ ДРУГОЕ",
-}
-
-CATEGORY_ORDER: list[str] = [
-    "kitchen",
-    "living",
-    "wardrobe",
-    "cabinets",
-    "library",
-    "other",
-]
-
-def _build_categories_keyboard(selected: set[str]) -> InlineKeyboardMarkup:
+class _FrozenKeyboard(InlineKeyboardMarkup):
+    """Клавиатура, которая сериализуется один раз при создании.
+
+    `to_dict()` вызывается PTB при каждой отправке — здесь он отдаёт готовый
+    словарь. Возвращаемый словарь общий для всех отправок, менять его нельзя.
+    """
+
+    __slots__ = ("_cached_dict",)
+
+    def __init__(self, inline_keyboard: list[list[InlineKeyboardButton]]) -> None:
+        super().__init__(inline_keyboard)
+        with self._unfrozen():
+            self._cached_dict = super().to_dict()
+
+    def to_dict(self, recursive: bool = True) -> dict:
+        return self._cached_dict
+
+
+def _render_categories_keyboard(content: Content, mask: int) -> _FrozenKeyboard:
     buttons: list[list[InlineKeyboardButton]] = []
     # Две колонки
     row: list[InlineKeyboardButton] = []
-    for idx, code in enumerate(CATEGORY_ORDER):
-        title = CATEGORY_DISPLAY[code]
-        is_selected = code in selected
+    for idx, (code, title) in enumerate(content.categories):
+        is_selected = bool(mask & (1 << idx))
         label = ("✅ " + title) if is_selected else title
         row.append(InlineKeyboardButton(text=label, callback_data=f"cat:{code}"))
         if len(row) == 2:
@@ -107,25 +304,72 @@ def _build_categories_keyboard(selected: set[str]) -> InlineKeyboardMarkup:
     if row:
         buttons.append(row)
     # Кнопка Готово
-    buttons.append([InlineKeyboardButton(text="Готово", callback_data="cat_done")])
-    return InlineKeyboardMarkup(buttons)
+    buttons.append([InlineKeyboardButton(text=content.quiz_done_button, callback_data="cat_done")])
+    return _FrozenKeyboard(buttons)
 
 
-async def design_quiz(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Старт квиза: мультивыбор категорий мебели."""
-    # Инициализировать выбранные категории
-    selected: set[str] = set()
-    context.user_data["selected_categories"] = selected
+# Все 2^N клавиатуры квиза, индекс — битовая маска выбранных категорий
+# (бит i соответствует i-й категории в content.json). Пересобираются, если
+# поменялись категории. Сохранённый выбор пользователей — тоже маска, поэтому
+# новые категории лучше добавлять в конец списка.
+_KEYBOARDS_CONTENT: Content | None = None
+_KEYBOARDS_SIGNATURE: tuple | None = None
+_CATEGORY_KEYBOARDS: tuple[_FrozenKeyboard, ...] = ()
+CATEGORY_BITS: dict[str, int] = {}
 
-    text = (
-        "🎨 Дизайн‑проект: пришлите план и пожелания, подготовим концепт.\n\n"
-        "Какая мебель вас интересует?"
+
+def _ensure_category_keyboards() -> None:
+    global _KEYBOARDS_CONTENT, _KEYBOARDS_SIGNATURE, _CATEGORY_KEYBOARDS, CATEGORY_BITS
+    content = CONTENT.current
+    if content is _KEYBOARDS_CONTENT:
+        return
+    _KEYBOARDS_CONTENT = content
+    signature = (content.categories, content.quiz_done_button)
+    if signature == _KEYBOARDS_SIGNATURE:
+        return
+    _CATEGORY_KEYBOARDS = tuple(
+        _render_categories_keyboard(content, mask) for mask in range(1 << len(content.categories))
     )
+    CATEGORY_BITS = {code: 1 << idx for idx, (code, _) in enumerate(content.categories)}
+    _KEYBOARDS_SIGNATURE = signature
+
+
+def _build_categories_keyboard(mask: int) -> InlineKeyboardMarkup:
+    _ensure_category_keyboards()
+    # Маска могла остаться от прежнего, более длинного списка категорий
+    return _CATEGORY_KEYBOARDS[mask & (len(_CATEGORY_KEYBOARDS) - 1)]
+
+
+def _selected_codes(mask: int) -> list[str]:
+    """Коды выбранных категорий в порядке content.json."""
+    _ensure_category_keyboards()
+    return [code for code, bit in CATEGORY_BITS.items() if mask & bit]
+
+
+# Отложенные правки клавиатуры квиза: одна правка на серию быстрых нажатий
+KEYBOARD_EDITS = EditCoalescer(settle=TOGGLE_SETTLE_SECONDS)
+
+
+async def design_quiz(update: Update, context: ContextTypes.DEFAULT_TYPE, selected: int = 0) -> None:
+    """Старт квиза: мультивыбор категорий мебели.
+
+    `selected` — категории, отмеченные заранее (например, названные в свободном тексте).
+    """
+    # Инициализировать выбранные категории (битовая маска, см. CATEGORY_BITS)
+    context.user_data["selected_categories"] = selected
+    context.user_data.pop("lead", None)
+
+    content = CONTENT.current
+    first_name = update.effective_user.first_name if update.effective_user else None
+    text = f"{content.reply('design', first_name)}\n\n{content.quiz_prompt}"
 
     if update.message:
-        await update.message.reply_text(text, reply_markup=_build_categories_keyboard(selected))
+        sent = await update.message.reply_text(text, reply_markup=_build_categories_keyboard(selected))
     elif update.callback_query and update.callback_query.message:
-        await update.callback_query.message.reply_text(text, reply_markup=_build_categories_keyboard(selected))
+        sent = await update.callback_query.message.reply_text(text, reply_markup=_build_categories_keyboard(selected))
+    else:
+        return
+    KEYBOARD_EDITS.mark_sent((sent.chat_id, sent.message_id), selected)
 
 
 async def on_category_toggle(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -136,31 +380,31 @@ async def on_category_toggle(update: Update, context: ContextTypes.DEFAULT_TYPE)
     await query.answer()
 
     code = query.data.split(":", maxsplit=1)[1]
-    selected: set[str] = context.user_data.get("selected_categories", set())
-    if code in selected:
-        selected.remove(code)
-    else:
-        selected.add(code)
+    _ensure_category_keyboards()
+    bit = CATEGORY_BITS.get(code)
+    if bit is None:  # кнопка со старой клавиатуры, такой категории больше нет
+        return
+    selected: int = context.user_data.get("selected_categories", 0) ^ bit
     context.user_data["selected_categories"] = selected
 
-    # Обновить клавиатуру текущего сообщения
-    if query.message:
-        try:
-            await query.message.edit_reply_markup(reply_markup=_build_categories_keyboard(selected))
-        except Exception as exc:  # noqa: BLE001 - логируем и продолжаем
-            logging.warning("Не удалось обновить клавиатуру: %s", exc)
-
+    # Обновить клавиатуру текущего сообщения, когда пользователь перестанет нажимать
+    message = query.message
+    if message:
+        async def _edit(state: int) -> None:
+            await message.edit_reply_markup(reply_markup=_build_categories_keyboard(state))
 
-def _slides_count_for_category(code: str) -> int:
-    if code == "kitchen":
-        return 6
-    if code == "other":
-        return 1
-    return 4
+        KEYBOARD_EDITS.request(
+            (message.chat_id, message.message_id), selected, _edit,
+            spawn=lambda coro: context.application.create_task(coro, update=update),
+        )
 
 
 def _build_slides_keyboard(code: str) -> InlineKeyboardMarkup:
-    total = _slides_count_for_category(code)
+    return _slides_keyboard(code, SLIDES.count(code))
+
+
+@functools.lru_cache(maxsize=256)
+def _slides_keyboard(code: str, total: int) -> _FrozenKeyboard:
     buttons: list[list[InlineKeyboardButton]] = []
     row: list[InlineKeyboardButton] = []
     for i in range(1, total + 1):
@@ -170,7 +414,7 @@ def _build_slides_keyboard(code: str) -> InlineKeyboardMarkup:
             row = []
     if row:
         buttons.append(row)
-    return InlineKeyboardMarkup(buttons)
+    return _FrozenKeyboard(buttons)
 
 
 async def on_category_done(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -178,7 +422,7 @@ async def on_category_done(update: Update, context: ContextTypes.DEFAULT_TYPE) -
     query = update.callback_query
     if not query:
         return
-    selected: set[str] = context.user_data.get("selected_categories", set())
+    selected = _selected_codes(context.user_data.get("selected_categories", 0))
     if not selected:
         await query.answer("Выберите хотя бы одну категорию", show_alert=True)
         return
@@ -186,44 +430,27 @@ async def on_category_done(update: Update, context: ContextTypes.DEFAULT_TYPE) -
 
     # Зафиксировать выбор в сообщении и убрать клавиатуру
     if query.message:
-        chosen_titles = ", ".join(CATEGORY_DISPLAY[c] for c in CATEGORY_ORDER if c in selected)
+        # Клавиатура больше не нужна — отложенная правка только помешает
+        KEYBOARD_EDITS.cancel((query.message.chat_id, query.message.message_id))
+        titles = CONTENT.current.category_titles
+        chosen_titles = ", ".join(titles.get(c, c) for c in selected)
         try:
             await query.message.edit_text(
                 f"Вы выбрали: {chosen_titles}\n\nПоказываю примеры слайдов по категориям:")
         except Exception:
             pass
 
+    # Сразу после запуска индекс слайдов может ещё строиться
+    await SLIDES_READY.wait()
     # Отправить медиагруппы с изображениями для каждой выбранной категории
-    for code in CATEGORY_ORDER:
-        if code not in selected:
-            continue
-        title = CATEGORY_DISPLAY[code]
-        limit = _slides_count_for_category(code)
-        paths = _list_slide_paths(code, limit)
+    for code in selected:
+        title = CONTENT.current.category_titles.get(code, code)
+        paths = _list_slide_paths(code)
         if not paths:
             await query.message.reply_text(f"{title}: не нашлось файлов в папке.")
             continue
-        # Если файлов несколько — отправим медиагруппу, иначе одиночное фото
-        if len(paths) > 1:
-            medias: list[InputMediaPhoto] = [InputMediaPhoto(media=FSInputFile(str(p))) for p in paths]
-            # Подпись только на первом
-            medias[0].caption = f"{title}: примеры"
-            messages = await query.message.reply_media_group(media=medias)
-            # Кэшируем file_id
-            cache: dict[str, str] = context.application.bot_data.setdefault("file_id_cache", {})
-            for p, m in zip(paths, messages):
-                if m.photo:
-                    cache[str(p)] = m.photo[-1].file_id
-        else:
-            p = paths[0]
-            cache: dict[str, str] = context.application.bot_data.setdefault("file_id_cache", {})
-            key = str(p)
-            if key in cache:
-                await query.message.reply_photo(photo=cache[key], caption=f"{title}: пример")
-            else:
-                m = await query.message.reply_photo(photo=FSInputFile(key), caption=f"{title}: пример")
-                if m.photo:
-                    cache[key] = m.photo[-1].file_id
+        caption = f"{title}: примеры" if len(paths) > 1 else f"{title}: пример"
+        await _send_slides(query.message, paths, caption=caption)
 
 
 async def on_slide_selected(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -240,68 +467,262 @@ async def on_slide_selected(update: Update, context: ContextTypes.DEFAULT_TYPE)
         pass
 
 
-SUPPORTED_IMAGE_EXTS: tuple[str, ...] = (".jpg", ".jpeg", ".png", ".webp")
+# Максимум фото в одной медиагруппе Telegram
+MEDIA_GROUP_LIMIT = 10
 
-def _slides_dir_for(code: str) -> Path:
-    return Path(__file__).resolve().parent / "slides" / code
+# Слайды отдаём уменьшенными копиями из DATA_DIR/slides (см. slide_derivatives.py)
+SLIDES = SlideCatalog(
+    Path(os.getenv("SLIDES_DIR") or Path(__file__).resolve().parent / "slides"),
+    derivatives=SlideDerivatives(
+        DATA_DIR / "slides",
+        max_side=env_number("SLIDE_MAX_SIDE", "1280", int),
+        quality=env_number("SLIDE_JPEG_QUALITY", "82", int),
+    ),
+)
 
-def _resolve_slide_path(code: str, idx: int) -> Path | None:
-    """Находит путь к слайду по соглашению имен или порядковому номеру в папке.
+def _list_slide_paths(code: str, limit: int | None = None) -> list[Path]:
+    """Возвращает список файлов для отправки по категории, максимум limit.
 
-    1) Ищем `slides/<code>/<code>_<idx>.<ext>` среди SUPPORTED_IMAGE_EXTS
-    2) Если не нашли — берём (idx)‑й файл по алфавиту среди поддерживаемых расширений
+    Порядок задаёт `SlideCatalog`: сначала `<code>_1.ext ... <code>_N.ext`,
+    затем остальные поддерживаемые изображения по алфавиту. Вместо исходников
+    возвращаются подготовленные для Telegram копии.
     """
-    base = _slides_dir_for(code)
-    if not base.exists() or not base.is_dir():
-        return None
+    paths = SLIDES.get(code)
+    return list(paths if limit is None else paths[:limit])
+
+
+FILE_IDS = FileIdCache(DATA_DIR / "file_ids.sqlite3")
 
-    # Попытка по шаблону имени
-    for ext in SUPPORTED_IMAGE_EXTS:
-        candidate = base / f"{code}_{idx}{ext}"
-        if candidate.exists():
-            return candidate
 
-    # Фоллбек: n‑й файл по сортировке
-    files = [p for p in base.iterdir() if p.suffix.lower() in SUPPORTED_IMAGE_EXTS and p.is_file()]
-    files.sort(key=lambda p: p.name.lower())
-    if 1 <= idx <= len(files):
-        return files[idx - 1]
-    return None
+def _upload(path: Path, attach: bool = False) -> InputFile:
+    # Path в InputMediaPhoto PTB превращает в file:// (это работает только с локальным
+    # Bot API сервером), поэтому передаём файл явно. Открытый файл httpx читает по частям
+    # во время отправки; закрыть его после запроса — _close_uploads.
+    return InputFile(path.open("rb"), filename=path.name, attach=attach, read_file_handle=False)
 
 
-def _list_slide_paths(code: str, limit: int) -> list[Path]:
-    """Возвращает список путей к слайдам для категории, максимум limit.
+def _close_uploads(media: list[str | InputFile]) -> None:
+    for m in media:
+        if isinstance(m, InputFile) and not isinstance(m.input_file_content, bytes):
+            m.input_file_content.close()
 
-    Предпочтение — именам `<code>_1.ext ... <code>_N.ext`. Если некоторых нет,
-    добираем алфавитной выборкой поддерживаемых изображений.
+
+def _slide_media(path: Path, attach: bool = False) -> str | InputFile:
+    """file_id из кэша, если слайд уже загружался, иначе содержимое файла.
+
+    `attach=True` нужен для файлов внутри медиагруппы.
     """
-    result: list[Path] = []
-    base = _slides_dir_for(code)
-    if not base.exists():
-        return result
-    # Сначала по шаблону
-    for i in range(1, limit + 1):
-        p = _resolve_slide_path(code, i)
-        if p and p.exists():
-            result.append(p)
-    if len(result) >= limit:
-        return result[:limit]
-    # Добор алфавитными файлами
-    files = [p for p in base.iterdir() if p.is_file() and p.suffix.lower() in SUPPORTED_IMAGE_EXTS]
-    files.sort(key=lambda p: p.name.lower())
-    for p in files:
-        if p not in result:
-            result.append(p)
-            if len(result) >= limit:
-                break
-    return result[:limit]
+    file_id = FILE_IDS.get(SLIDES.digest(path))
+    if metrics.REGISTRY.enabled:
+        metrics.FILE_ID_CACHE.inc(result="hit" if file_id else "miss")
+    return file_id or _upload(path, attach)
+
+
+def _uploaded_bytes(media: list[str | InputFile]) -> int:
+    return sum(
+        len(m.input_file_content) if isinstance(m.input_file_content, bytes)
+        else os.fstat(m.input_file_content.fileno()).st_size
+        for m in media if isinstance(m, InputFile)
+    )
+
+
+async def _remember_file_ids(paths: list[Path], messages: list[Message]) -> None:
+    items: list[tuple[str, str]] = []
+    for p, m in zip(paths, messages):
+        digest = SLIDES.digest(p)
+        if digest and m.photo:
+            items.append((digest, m.photo[-1].file_id))
+    await FILE_IDS.put_many(items)
+
+
+async def _send_slides(message: Message, paths: list[Path], caption: str) -> None:
+    """Отправляет слайды альбомами по MEDIA_GROUP_LIMIT, используя кэш file_id."""
+    # Telegram принимает не больше MEDIA_GROUP_LIMIT фото в альбоме — режем на части
+    for start in range(0, len(paths), MEDIA_GROUP_LIMIT):
+        chunk = paths[start:start + MEDIA_GROUP_LIMIT]
+        # Подпись только на первом фото первого альбома
+        chunk_caption = caption if start == 0 else None
+        # Если файлов несколько — отправим медиагруппу, иначе одиночное фото
+        if len(chunk) > 1:
+            files = [_slide_media(p, attach=True) for p in chunk]
+            medias = [
+                InputMediaPhoto(media=f, caption=chunk_caption if i == 0 else None)
+                for i, f in enumerate(files)
+            ]
+            if metrics.REGISTRY.enabled:
+                metrics.UPLOAD_BYTES.observe(_uploaded_bytes(files), method="sendMediaGroup")
+            try:
+                messages = await message.reply_media_group(media=medias)
+            finally:
+                _close_uploads(files)
+        else:
+            photo = _slide_media(chunk[0])
+            if metrics.REGISTRY.enabled:
+                metrics.UPLOAD_BYTES.observe(_uploaded_bytes([photo]), method="sendPhoto")
+            try:
+                messages = [await message.reply_photo(photo=photo, caption=chunk_caption)]
+            finally:
+                _close_uploads([photo])
+        await _remember_file_ids(chunk, list(messages))
+
+
+async def _warm_up_file_ids(bot: Bot) -> None:
+    """Заранее загружает в WARMUP_CHAT_ID слайды, для которых ещё нет file_id."""
+    if WARMUP_CHAT_ID is None:
+        return
+    missing: list[Path] = []
+    seen: set[str] = set()
+    for code in SLIDES.codes():
+        for p in SLIDES.get(code):
+            digest = SLIDES.digest(p)
+            if digest and digest not in FILE_IDS and digest not in seen:
+                seen.add(digest)
+                missing.append(p)
+    if not missing:
+        return
+    logging.info("Прогрев кэша file_id: %d слайдов", len(missing))
+    for start in range(0, len(missing), MEDIA_GROUP_LIMIT):
+        chunk = missing[start:start + MEDIA_GROUP_LIMIT]
+        files = [_upload(p, attach=len(chunk) > 1) for p in chunk]
+        try:
+            if len(chunk) > 1:
+                messages = list(await bot.send_media_group(
+                    WARMUP_CHAT_ID, media=[InputMediaPhoto(media=f) for f in files], disable_notification=True,
+                ))
+            else:
+                messages = [await bot.send_photo(WARMUP_CHAT_ID, photo=files[0], disable_notification=True)]
+        except Exception as exc:  # noqa: BLE001 - прогрев не должен ронять бота
+            logging.warning("Не удалось прогреть кэш file_id: %s", exc)
+            return
+        finally:
+            _close_uploads(files)
+        await _remember_file_ids(chunk, messages)
+        try:
+            await bot.delete_messages(WARMUP_CHAT_ID, [m.message_id for m in messages])
+        except Exception as exc:  # noqa: BLE001 - логируем и продолжаем
+            logging.warning("Не удалось удалить сообщения прогрева: %s", exc)
+
+
+async def reload_slides(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Служебная команда /reload_slides: полностью перечитать папки слайдов."""
+    if not update.message:
+        return
+    if not update.effective_user or update.effective_user.id not in ADMIN_IDS:
+        return
+    codes = await asyncio.to_thread(SLIDES.reload)
+    await _warm_up_file_ids(context.bot)
+    lines = [f"{code}: {SLIDES.count(code)}" for code in codes]
+    await update.message.reply_text("Слайды перечитаны.\n" + "\n".join(lines))
+
+
+async def send_stats(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Служебная команда /send_stats: очередь и ожидание в планировщике отправки."""
+    if not update.message:
+        return
+    if not update.effective_user or update.effective_user.id not in ADMIN_IDS:
+        return
+    stats = json.dumps(SEND_SCHEDULER.stats(), ensure_ascii=False, indent=1)
+    await update.message.reply_text(stats)
+
+
+async def export_leads(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Служебная команда /export_leads [csv|json] [после_id]: файл с заявками."""
+    if not update.message:
+        return
+    if not update.effective_user or update.effective_user.id not in ADMIN_IDS:
+        return
+    args = context.args or []
+    fmt = args[0].lower() if args else "csv"
+    after_id = args[1] if len(args) > 1 else "0"
+    if fmt not in EXPORT_FORMATS or not after_id.isdigit():
+        await update.message.reply_text("Формат: /export_leads [csv|json] [после_id]")
+        return
+    path = DATA_DIR / f"leads-{time.strftime('%Y%m%d-%H%M%S')}.{'csv' if fmt == 'csv' else 'jsonl'}"
+    try:
+        count = await asyncio.to_thread(LEADS.export, path, fmt, CONTENT.current.lead_fields, int(after_id))
+        if count:
+            with path.open("rb") as f:
+                document = InputFile(f, filename=path.name, read_file_handle=False)
+                await update.message.reply_document(document, caption=f"Заявок: {count}")
+        else:
+            await update.message.reply_text("Новых заявок нет.")
+    finally:
+        path.unlink(missing_ok=True)
+
+
+# Выставляется, когда индекс слайдов и кэш file_id готовы (см. _prepare_slides)
+SLIDES_READY = asyncio.Event()
+
+
+async def _prepare_slides(bot: Bot) -> None:
+    """Кэш file_id, индекс слайдов и прогрев — в фоне, чтобы бот сразу начал принимать обновления."""
+    try:
+        loaded = await asyncio.to_thread(FILE_IDS.open, bot.id)
+        logging.info("Кэш file_id: %d записей", loaded)
+        await asyncio.to_thread(SLIDES.reload)
+        _ensure_category_keyboards()
+        _intent_router(CONTENT.current)
+    except Exception as exc:  # noqa: BLE001 - без слайдов бот всё равно должен отвечать
+        logging.warning("Не удалось подготовить слайды: %s", exc)
+    finally:
+        SLIDES_READY.set()
+    await _warm_up_file_ids(bot)
+    if SLIDES_REFRESH_INTERVAL > 0:
+        await _watch_slides(bot)
+
+
+async def _watch_slides(bot: Bot) -> None:
+    """Фоновая проверка mtime папок слайдов."""
+    while True:
+        await asyncio.sleep(SLIDES_REFRESH_INTERVAL)
+        try:
+            if await asyncio.to_thread(SLIDES.refresh):
+                await _warm_up_file_ids(bot)
+        except Exception as exc:  # noqa: BLE001 - логируем и продолжаем
+            logging.warning("Не удалось обновить каталог слайдов: %s", exc)
+
+# Входящие альбомы: файлы одного media_group_id возвращаем одной медиагруппой
+ALBUMS = AlbumBuffer(window=ALBUM_WINDOW_SECONDS, max_items=MEDIA_GROUP_LIMIT)
+
+UNSUPPORTED_DOCUMENT_TEXT = "Пожалуйста, пришлите файл формата PDF, PPT или PPTX."
+
+
+def _collect_album_item(update: Update, context: ContextTypes.DEFAULT_TYPE, unique_id: str,
+                        item: InputMediaPhoto | InputMediaDocument | None) -> None:
+    """Кладёт файл в буфер альбома; None — документ неподдерживаемого формата."""
+    message = update.message
+
+    async def _flush(items: list[InputMediaPhoto | InputMediaDocument | None]) -> None:
+        await _send_album(message, items)
+
+    ALBUMS.add(
+        (message.chat_id, message.media_group_id), unique_id, item, _flush,
+        spawn=lambda coro: context.application.create_task(coro, update=update),
+    )
+
+
+async def _send_album(message: Message, items: list[InputMediaPhoto | InputMediaDocument | None]) -> None:
+    media = [m for m in items if m is not None]
+    if len(media) < len(items):
+        await message.reply_text(UNSUPPORTED_DOCUMENT_TEXT)
+    if len(media) > 1:
+        await message.reply_media_group(media=media)
+    elif media and isinstance(media[0], InputMediaPhoto):
+        await message.reply_photo(photo=media[0].media, caption=media[0].caption or "")
+    elif media:
+        await message.reply_document(document=media[0].media, caption=media[0].caption or "")
+
 
 async def handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Принимает фото и отправляет его обратно тем же сообщением."""
+    """Принимает фото и отправляет его обратно тем же сообщением (альбом — одним альбомом)."""
     if not update.message or not update.message.photo:
         return
     largest_photo = update.message.photo[-1]
     caption = update.message.caption or ""
+    if update.message.media_group_id:
+        item = InputMediaPhoto(media=largest_photo.file_id, caption=caption)
+        _collect_album_item(update, context, largest_photo.file_unique_id, item)
+        return
     await update.message.reply_photo(photo=largest_photo.file_id, caption=caption)
 
 SUPPORTED_EXTENSIONS = {".pdf", ".ppt", ".pptx"}
@@ -313,54 +734,174 @@ def _has_supported_ext(filename: str | None) -> bool:
     return any(lower.endswith(ext) for ext in SUPPORTED_EXTENSIONS)
 
 async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Принимает документ (PDF/PPT/PPTX) и отправляет обратно как файл."""
+    """Принимает документ (PDF/PPT/PPTX) и отправляет обратно как файл (альбом — одним альбомом)."""
     if not update.message or not update.message.document:
         return
     doc = update.message.document
+    caption = update.message.caption or ""
+    if update.message.media_group_id:
+        item = InputMediaDocument(media=doc.file_id, caption=caption) if _has_supported_ext(doc.file_name) else None
+        _collect_album_item(update, context, doc.file_unique_id, item)
+        return
     if not _has_supported_ext(doc.file_name):
-        await update.message.reply_text(
-            "Пожалуйста, пришлите файл формата PDF, PPT или PPTX."
-        )
+        await update.message.reply_text(UNSUPPORTED_DOCUMENT_TEXT)
         return
-    caption = update.message.caption or ""
     await update.message.reply_document(document=doc.file_id, caption=caption)
 
-def main() -> None:
-    """Основная функция для запуска бота"""
-    # Создаем приложение
-    application = Application.builder().token(BOT_TOKEN).build()
+async def _expire_sessions(app: Application) -> None:
+    """Сбрасывает сессии, которые не трогали дольше PERSISTENCE.ttl."""
+    while True:
+        await asyncio.sleep(min(PERSISTENCE.ttl, 3600))
+        try:
+            for user_id in PERSISTENCE.expired():
+                app.drop_user_data(user_id)
+            await PERSISTENCE.purge_expired()
+        except Exception as exc:  # noqa: BLE001 - логируем и продолжаем
+            logging.warning("Не удалось удалить устаревшие сессии: %s", exc)
+
+# Фоновые задачи, которые живут всё время работы бота
+_background_tasks: set[asyncio.Task] = set()
+
+# HTTP-эндпоинт /metrics, если задан METRICS_ADDR
+_metrics_server: metrics.MetricsServer | None = None
+
+async def _sync_menu(app: Application, content: Content) -> None:
+    """Зарегистрировать команды бота в меню клиента, если меню изменилось.
+
+    Хеш последнего отправленного меню хранится в bot_data (переживает перезапуск),
+    поэтому обычный рестарт обходится без запроса к Telegram.
+    """
+    digest = hashlib.sha256(json.dumps([app.bot.id, content.menu], ensure_ascii=False).encode()).hexdigest()
+    if app.bot_data.get("menu_digest") == digest:
+        return
+    await app.bot.set_my_commands([BotCommand(name, description) for name, description in content.menu])
+    app.bot_data["menu_digest"] = digest
+
+
+async def _watch_content(app: Application) -> None:
+    """Фоновая проверка content.json: новые тексты подменяются без перезапуска."""
+    while True:
+        await asyncio.sleep(CONTENT_REFRESH_INTERVAL)
+        old = CONTENT.current
+        try:
+            if not await asyncio.to_thread(CONTENT.refresh):
+                continue
+            # Клавиатуры квиза и индекс ключевых слов собираем здесь, а не в первом обработчике
+            _ensure_category_keyboards()
+            _intent_router(CONTENT.current)
+            if CONTENT.current.menu != old.menu:
+                await _sync_menu(app, CONTENT.current)
+        except Exception as exc:  # noqa: BLE001 - логируем и продолжаем
+            logging.warning("Не удалось применить новые тексты: %s", exc)
+
+
+async def _post_init(app: Application) -> None:
+    await _sync_menu(app, CONTENT.current)
+    _background_tasks.add(asyncio.create_task(_prepare_slides(app.bot)))
+    if CONTENT_REFRESH_INTERVAL > 0:
+        _background_tasks.add(asyncio.create_task(_watch_content(app)))
+    if PERSISTENCE.ttl > 0:
+        _background_tasks.add(asyncio.create_task(_expire_sessions(app)))
+    global _metrics_server
+    if metrics.METRICS_ADDR and _metrics_server is None:
+        _metrics_server = metrics.MetricsServer(metrics.METRICS_ADDR)
+        await _metrics_server.start()
+
+
+async def _post_shutdown(app: Application) -> None:
+    for task in _background_tasks:
+        task.cancel()
+    await asyncio.gather(*_background_tasks, return_exceptions=True)
+    _background_tasks.clear()
+    global _metrics_server
+    if _metrics_server is not None:
+        await _metrics_server.stop()
+        _metrics_server = None
+    await LEADS.close()
+    FILE_IDS.close()
+
+
+def build_application(token: str, base_url: str | None = None) -> Application:
+    """Собирает приложение со всеми обработчиками.
+
+    `base_url` позволяет направить бота на другой сервер Bot API
+    (например, на локальную заглушку из bench/).
+    """
+    processor = PerChatUpdateProcessor(MAX_CONCURRENT_UPDATES)
+    # Один SSL-контекст на оба HTTP-клиента: загрузка корневых сертификатов —
+    # заметная часть времени запуска, а по умолчанию PTB делает её дважды
+    tls = httpx.create_ssl_context()
+    builder = (
+        Application.builder()
+        .token(token)
+        .request(RoutingRequest(http_request(HTTP_POOL, tls), http_request(HTTP_UPLOAD_POOL, tls)))
+        .get_updates_request(http_request(HTTP_POLLING_POOL, tls))
+        .rate_limiter(SEND_SCHEDULER)
+        .concurrent_updates(processor)
+        .persistence(PERSISTENCE)
+    )
+    if base_url:
+        builder = builder.base_url(base_url)
+    application = builder.build()
+
+    # При выключенных метриках instrument() возвращает обработчик без обёртки; имя
+    # обработчика в логах нужно только в JSON-формате
+    if LOG_SETTINGS.fmt == "json":
+        def timed(handler):
+            return metrics.instrument(logging_setup.tagged(handler))
+    else:
+        timed = metrics.instrument
+    if metrics.REGISTRY.enabled:
+        processor.on_processed = metrics.observe_update
+        metrics.REGISTRY.gauge("bot_update_queue_depth", "Обновления, ждущие обработки",
+                               lambda: application.update_queue.qsize() + processor.waiting)
+        metrics.REGISTRY.gauge("bot_updates_active", "Обновления в обработке", lambda: processor.active)
+        metrics.REGISTRY.gauge("bot_send_queue_depth", "Запросы, ждущие в планировщике отправки",
+                               lambda: SEND_SCHEDULER.queue_depth)
+        metrics.REGISTRY.gauge("bot_leads_pending", "Заявки, ещё не записанные на диск", lambda: LEADS.pending)
     
     # Добавляем обработчики
-    application.add_handler(CommandHandler("start", start))
+    application.add_handler(CommandHandler("start", timed(start)))
     # Команды
-    application.add_handler(CommandHandler("design", design_quiz))
-    application.add_handler(CommandHandler(["measure","price","portfolio","showroom","contacts","help"], on_command))
+    application.add_handler(CommandHandler("design", timed(design_quiz)))
     
     # Callback кнопки квиза
-    application.add_handler(CallbackQueryHandler(on_category_toggle, pattern=r"^cat:"))
-    application.add_handler(CallbackQueryHandler(on_category_done, pattern=r"^cat_done$"))
+    application.add_handler(CallbackQueryHandler(timed(on_category_toggle), pattern=r"^cat:"))
+    application.add_handler(CallbackQueryHandler(timed(on_category_done), pattern=r"^cat_done$"))
     application.add_handler(CallbackQueryHandler(on_slide_selected, pattern=r"^slide:"))
-    application.add_handler(MessageHandler(filters.PHOTO, handle_photo))
-    application.add_handler(MessageHandler(filters.Document.ALL, handle_document))
+    application.add_handler(MessageHandler(filters.PHOTO, timed(handle_photo)))
+    application.add_handler(MessageHandler(filters.Document.ALL, timed(handle_document)))
+    # Свободный текст в личке — ключевые слова из content.json
+    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND & filters.ChatType.PRIVATE, timed(on_text)))
     
-    # Зарегистрировать команды бота в меню клиента
-    async def _set_commands(app: Application) -> None:
-        await app.bot.set_my_commands([
-            BotCommand("start", "Главное меню"),
-            BotCommand("measure", "Профессиональный замер"),
-            BotCommand("price", "Стоимость проекта"),
-            BotCommand("design", "Дизайн‑проект"),
-            BotCommand("portfolio", "Портфолио работ"),
-            BotCommand("showroom", "Шоурум"),
-            BotCommand("contacts", "Контакты"),
-            BotCommand("help", "Помощь"),
-        ])
-
-    application.post_init = _set_commands
+    application.add_handler(CommandHandler("reload_slides", reload_slides))
+    application.add_handler(CommandHandler("send_stats", send_stats))
+    application.add_handler(CommandHandler("export_leads", export_leads))
+    # Остальные команды берутся из content.json, поэтому их список не фиксируем.
+    # Этот обработчик должен идти последним в группе.
+    application.add_handler(MessageHandler(filters.COMMAND, timed(on_command)))
+
+    application.post_init = _post_init
+    application.post_shutdown = _post_shutdown
+    return application
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Основная функция для запуска бота"""
+    mode = parse_mode(argv)
+    webhook_config = WebhookConfig.from_env() if mode == "webhook" else None
+    check_config(BOT_TOKEN)
+    logging_setup.configure_from(LOG_SETTINGS)
+    # Создаем приложение. Индекс слайдов строится в фоне после запуска (см. _prepare_slides)
+    application = build_application(BOT_TOKEN)
 
     # Запускаем бота
     print("Бот запущен! Нажмите Ctrl+C для остановки.")
-    application.run_polling()
+    if mode == "webhook":
+        run_webhook(application, webhook_config,
+                    inline_reply=functools.partial(inline_reply, user_data=application.user_data))
+    else:
+        application.run_polling()
 
 if __name__ == '__main__':
     main()
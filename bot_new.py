@@ -1,107 +1,93 @@
-import os
+import asyncio
 import logging
+import os
+from pathlib import Path
 from dotenv import load_dotenv
 from telegram import Update, BotCommand
-from telegram.ext import Application, CommandHandler, ContextTypes, MessageHandler, filters
+from telegram.ext import Application, ContextTypes, MessageHandler, filters
+
+import logging_setup
+from config import check_config, env_number
+from content import Content, ContentRegistry, addressed_to_other_bot, command_name
+from webhook import WebhookConfig, parse_mode, run_webhook
 
 # Загрузить переменные окружения из .env
 load_dotenv()
 
-# Настройка логирования
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
-
-# Читаем токен из переменной окружения
+# Читаем токен из переменной окружения (проверяется в main)
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 
-if not BOT_TOKEN:
-    raise RuntimeError("Не найден BOT_TOKEN. Убедитесь, что в файле .env есть строка BOT_TOKEN=\"ВАШ_ТОКЕН\"")
-
-async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Обработчик команды /start - ТОЛЬКО ТЕКСТ, БЕЗ КНОПОК"""
-    if not update.message:
-        return
-    
-    user_name = update.effective_user.first_name if update.effective_user else "друг"
-    text = (
-        f"🏠 Добро пожаловать в мебельную студию Еврособа, {user_name}!\n\n"
-        "Мы создаем премиальную мебель на заказ для тех, кто ценит качество, стиль и индивидуальный подход.\n\n"
-        "🎯 Что вас интересует?\n\n"
-        "📏 Заказать профессиональный замер — /measure\n"
-        "💰 Узнать стоимость проекта — /price\n"
-        "🎨 Запросить дизайн-проект — /design\n"
-        "📸 Посмотреть портфолио работ — /portfolio\n"
-        "🏢 Записаться в шоурум — /showroom\n"
-        "📞 Получить контакты — /contacts\n"
-        "🤖 Умный помощник (ответит на любой вопрос) — /help\n\n"
-        "💬 Или просто опишите ваш проект — я пойму и помогу выбрать лучший вариант!"
-    )
-    
-    await update.message.reply_text(text)
-
-async def measure(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Профессиональный замер"""
-    await update.message.reply_text("📏 Профессиональный замер: оставьте адрес и удобное время, мы свяжемся.")
+# Логи — как в bot.py: формат, уровень и прореживание из LOG_* (см. logging_setup.py)
+LOG_SETTINGS = logging_setup.LogSettings.from_env()
 
-async def price(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Стоимость проекта"""
-    await update.message.reply_text("💲 Стоимость проекта: опишите задачу и материалы — рассчитаем смету.")
+# Тексты команд и меню — общие с bot.py (см. content.json)
+CONTENT = ContentRegistry(Path(os.getenv("CONTENT_FILE") or Path(__file__).resolve().parent / "content.json"))
 
-async def design(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Дизайн-проект"""
-    await update.message.reply_text("🎨 Дизайн‑проект: пришлите план и пожелания, подготовим концепт.")
+# Как часто (в секундах) проверять content.json на изменения; 0 — не проверять
+CONTENT_REFRESH_INTERVAL = env_number("CONTENT_REFRESH_INTERVAL", "5")
 
-async def portfolio(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Портфолио"""
-    await update.message.reply_text("📸 Портфолио: отправлю примеры работ и проекты похожие на ваш.")
-
-async def showroom(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Шоурум"""
-    await update.message.reply_text("🏢 Шоурум: адрес и часы работы. Хотите записаться на визит?")
-
-async def contacts(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Контакты"""
-    await update.message.reply_text("📞 Контакты: телефон, WhatsApp, email. Чем удобно связаться?")
-
-async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Помощь"""
-    await update.message.reply_text("🤖 Задайте любой вопрос — постараюсь помочь!")
-
-def main() -> None:
+async def on_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Ответ на любую команду из content.json - ТОЛЬКО ТЕКСТ, БЕЗ КНОПОК"""
+    if not update.message:
+        return
+    # Список команд берём из текущей версии content.json, а не фиксируем при запуске
+    content = CONTENT.current
+    name = command_name(update.message.text)
+    if name not in content.commands or addressed_to_other_bot(update.message.text, context.bot.username):
+        return
+    first_name = update.effective_user.first_name if update.effective_user else None
+    await update.message.reply_text(content.reply(name, first_name))
+
+async def _set_commands(app: Application, content: Content) -> None:
+    """Зарегистрировать команды бота в меню клиента"""
+    await app.bot.set_my_commands([BotCommand(name, description) for name, description in content.menu])
+
+async def _watch_content(app: Application) -> None:
+    """Фоновая проверка content.json: новые тексты подменяются без перезапуска."""
+    while True:
+        await asyncio.sleep(CONTENT_REFRESH_INTERVAL)
+        old = CONTENT.current
+        try:
+            if await asyncio.to_thread(CONTENT.refresh) and CONTENT.current.menu != old.menu:
+                await _set_commands(app, CONTENT.current)
+        except Exception as exc:  # noqa: BLE001 - логируем и продолжаем
+            logging.warning("Не удалось применить новые тексты: %s", exc)
+
+# Фоновая проверка content.json, пока бот работает
+_background_tasks: set[asyncio.Task] = set()
+
+async def _post_init(app: Application) -> None:
+    await _set_commands(app, CONTENT.current)
+    if CONTENT_REFRESH_INTERVAL > 0:
+        _background_tasks.add(asyncio.create_task(_watch_content(app)))
+
+async def _post_shutdown(app: Application) -> None:
+    for task in _background_tasks:
+        task.cancel()
+    await asyncio.gather(*_background_tasks, return_exceptions=True)
+    _background_tasks.clear()
+
+def main(argv: list[str] | None = None) -> None:
     """Основная функция для запуска бота"""
+    mode = parse_mode(argv)
+    webhook_config = WebhookConfig.from_env() if mode == "webhook" else None
+    check_config(BOT_TOKEN)
+    logging_setup.configure_from(LOG_SETTINGS)
     # Создаем приложение
     application = Application.builder().token(BOT_TOKEN).build()
     
     # Добавляем обработчики - ТОЛЬКО КОМАНДЫ, БЕЗ КНОПОК
-    application.add_handler(CommandHandler("start", start))
-    application.add_handler(CommandHandler("measure", measure))
-    application.add_handler(CommandHandler("price", price))
-    application.add_handler(CommandHandler("design", design))
-    application.add_handler(CommandHandler("portfolio", portfolio))
-    application.add_handler(CommandHandler("showroom", showroom))
-    application.add_handler(CommandHandler("contacts", contacts))
-    application.add_handler(CommandHandler("help", help_command))
-    
-    # Зарегистрировать команды бота в меню клиента
-    async def _set_commands(app: Application) -> None:
-        await app.bot.set_my_commands([
-            BotCommand("start", "Главное меню"),
-            BotCommand("measure", "Профессиональный замер"),
-            BotCommand("price", "Стоимость проекта"),
-            BotCommand("design", "Дизайн‑проект"),
-            BotCommand("portfolio", "Портфолио работ"),
-            BotCommand("showroom", "Шоурум"),
-            BotCommand("contacts", "Контакты"),
-            BotCommand("help", "Помощь"),
-        ])
-
-    application.post_init = _set_commands
+    application.add_handler(MessageHandler(filters.COMMAND, on_command))
+
+    application.post_init = _post_init
+    application.post_shutdown = _post_shutdown
 
     # Запускаем бота
     print("Бот запущен! Нажмите Ctrl+C для остановки.")
-    application.run_polling()
+    if mode == "webhook":
+        run_webhook(application, webhook_config)
+    else:
+        application.run_polling()
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,39 @@
+"""Переменные окружения: чтение с отложенной проверкой.
+
+Модули читают настройки при импорте через `env_number()` и `env_ids()`.
+Ошибка в значении не роняет импорт: она копится в `CONFIG_ERRORS`, вместо
+значения берётся значение по умолчанию, а `check_config()` в main() точки
+входа (bot.py, bot_new.py) сообщает обо всех проблемах разом.
+"""
+import os
+
+CONFIG_ERRORS: list[str] = []
+
+
+def env_number(name: str, default: str, kind: type = float):
+    raw = os.getenv(name) or default
+    try:
+        return kind(raw)
+    except ValueError:
+        CONFIG_ERRORS.append(f"{name}={raw!r}: ожидается число")
+        return kind(default)
+
+
+def env_ids(name: str) -> frozenset[int]:
+    """Список id через запятую."""
+    ids = set()
+    for x in os.getenv(name, "").replace(" ", "").split(","):
+        if x.lstrip("-").isdigit():
+            ids.add(int(x))
+        elif x:
+            CONFIG_ERRORS.append(f"{name}: {x!r} не похоже на id")
+    return frozenset(ids)
+
+
+def check_config(token: str | None) -> None:
+    """Проверяет токен и переменные окружения; при ошибке — RuntimeError со всеми проблемами."""
+    errors = list(CONFIG_ERRORS)
+    if not token:
+        errors.insert(0, "Не найден BOT_TOKEN. Убедитесь, что в файле .env есть строка BOT_TOKEN=\"ВАШ_ТОКЕН\"")
+    if errors:
+        raise RuntimeError("\n".join(errors))
@@ -0,0 +1,199 @@
+"""Тексты бота из одного файла `content.json`.
+
+Файл описывает команды (описание для меню, текст ответа и вопросы заявки),
+тексты по умолчанию и категории квиза. При загрузке он компилируется в неизменяемые
+таблицы: шаблоны заранее разрезаны по `{name}`, так что на каждый ответ
+остаётся только подставить имя пользователя.
+
+`ContentRegistry.refresh()` перечитывает файл, если поменялось время его
+изменения, и целиком заменяет `current` — обработчик, взявший `current` один
+раз, видит согласованную версию. Ошибочный файл не применяется: остаётся
+прежняя версия, а в лог пишется причина.
+"""
+import json
+import logging
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Mapping
+
+# Подставляется в шаблоны вместо имени пользователя
+NAME_PLACEHOLDER = "{name}"
+
+# Клавиатуры квиза строятся заранее для всех 2^N вариантов выбора
+MAX_CATEGORIES = 10
+
+
+@dataclass(frozen=True, slots=True)
+class Template:
+    parts: tuple[str, ...]
+
+    @classmethod
+    def compile(cls, text: str) -> "Template":
+        return cls(tuple(text.split(NAME_PLACEHOLDER)))
+
+    def render(self, name: str) -> str:
+        if len(self.parts) == 1:
+            return self.parts[0]
+        return name.join(self.parts)
+
+
+@dataclass(frozen=True, slots=True)
+class LeadField:
+    # Ключ поля в сохранённой заявке
+    key: str
+    prompt: str
+
+
+@dataclass(frozen=True, slots=True)
+class Command:
+    name: str
+    description: str
+    reply: Template
+    # Слова, по которым к команде относится свободный текст (см. intent_router.py)
+    keywords: tuple[str, ...] = ()
+    # Особое действие вместо текстового ответа (например, "quiz"), иначе None
+    action: str | None = None
+    # Вопросы заявки, которые бот задаёт по очереди после ответа (см. lead_store.py)
+    lead: tuple[LeadField, ...] = ()
+
+
+@dataclass(frozen=True, slots=True)
+class Content:
+    commands: Mapping[str, Command]
+    # (команда, описание) в порядке файла — для set_my_commands
+    menu: tuple[tuple[str, str], ...]
+    default_name: str
+    unknown_command: str
+    quiz_prompt: str
+    quiz_done_button: str
+    # (код, название) категорий квиза в порядке файла
+    categories: tuple[tuple[str, str], ...]
+    category_titles: Mapping[str, str]
+    category_keywords: Mapping[str, tuple[str, ...]]
+    # Ответ на свободный текст, в котором не нашлось ни команды, ни категории
+    free_text_fallback: str
+    # Ответ после последнего вопроса заявки
+    lead_done: Template
+    # Ответ на команду с заявкой не в личке: заявки собираются только в личных сообщениях
+    lead_private_only: str
+    # Все ключи полей заявок в порядке файла — колонки выгрузки
+    lead_fields: tuple[str, ...]
+    # Команды, ответ на которые — просто текст (без квиза и заявки)
+    text_commands: frozenset[str]
+
+    def reply(self, command: str, first_name: str | None) -> str:
+        cmd = self.commands.get(command)
+        if cmd is None:
+            return self.unknown_command
+        return cmd.reply.render(first_name or self.default_name)
+
+
+def _require(data: Any, key: str, kind: type) -> Any:
+    value = data.get(key) if isinstance(data, Mapping) else None
+    if not isinstance(value, kind):
+        raise ValueError(f"content: поле {key!r} должно быть {kind.__name__}")
+    return value
+
+
+def _keywords(data: Mapping[str, Any]) -> tuple[str, ...]:
+    keywords = data.get("keywords", [])
+    if not isinstance(keywords, list) or not all(isinstance(k, str) for k in keywords):
+        raise ValueError("content: поле 'keywords' должно быть списком строк")
+    return tuple(keywords)
+
+
+def _lead(data: Mapping[str, Any]) -> tuple[LeadField, ...]:
+    fields = tuple(
+        LeadField(key=_require(f, "field", str), prompt=_require(f, "prompt", str))
+        for f in data.get("lead", [])
+    )
+    if len({f.key for f in fields}) != len(fields):
+        raise ValueError("content: поля заявки повторяются")
+    return fields
+
+
+def compile_content(data: Mapping[str, Any]) -> Content:
+    commands: dict[str, Command] = {}
+    for item in _require(data, "commands", list):
+        name = _require(item, "command", str)
+        if name in commands:
+            raise ValueError(f"content: команда {name!r} описана дважды")
+        commands[name] = Command(
+            name=name,
+            description=_require(item, "description", str),
+            reply=Template.compile(_require(item, "reply", str)),
+            keywords=_keywords(item),
+            action=item.get("action"),
+            lead=_lead(item),
+        )
+    quiz = _require(data, "quiz", dict)
+    raw_categories = _require(quiz, "categories", list)
+    categories = tuple((_require(c, "code", str), _require(c, "title", str)) for c in raw_categories)
+    if len({code for code, _ in categories}) != len(categories):
+        raise ValueError("content: коды категорий квиза повторяются")
+    if len(categories) > MAX_CATEGORIES:
+        raise ValueError(f"content: категорий квиза больше {MAX_CATEGORIES}")
+    return Content(
+        commands=MappingProxyType(commands),
+        menu=tuple((cmd.name, cmd.description) for cmd in commands.values()),
+        default_name=_require(data, "default_name", str),
+        unknown_command=_require(data, "unknown_command", str),
+        quiz_prompt=_require(quiz, "prompt", str),
+        quiz_done_button=_require(quiz, "done_button", str),
+        categories=categories,
+        category_titles=MappingProxyType(dict(categories)),
+        category_keywords=MappingProxyType({c["code"]: _keywords(c) for c in raw_categories}),
+        free_text_fallback=_require(data, "free_text_fallback", str),
+        lead_done=Template.compile(_require(data, "lead_done", str)),
+        lead_private_only=_require(data, "lead_private_only", str),
+        lead_fields=tuple(dict.fromkeys(f.key for cmd in commands.values() for f in cmd.lead)),
+        text_commands=frozenset(name for name, cmd in commands.items() if cmd.action is None and not cmd.lead),
+    )
+
+
+def load_content(path: Path) -> Content:
+    with open(path, encoding="utf-8") as f:
+        return compile_content(json.load(f))
+
+
+class ContentRegistry:
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._mtime_ns = os.stat(path).st_mtime_ns
+        self.current = load_content(path)
+
+    def refresh(self) -> bool:
+        """Перечитывает файл, если он изменился. Возвращает True, если тексты заменены."""
+        try:
+            mtime_ns = os.stat(self.path).st_mtime_ns
+        except OSError as exc:
+            logging.warning("Не удалось проверить %s: %s", self.path, exc)
+            return False
+        if mtime_ns == self._mtime_ns:
+            return False
+        self._mtime_ns = mtime_ns
+        try:
+            content = load_content(self.path)
+        except (OSError, ValueError) as exc:
+            logging.warning("Тексты из %s не применены: %s", self.path, exc)
+            return False
+        self.current = content
+        logging.info("Тексты обновлены из %s", self.path)
+        return True
+
+
+def command_name(text: str | None) -> str:
+    """`/help@EvrosobaBot arg` → `help`."""
+    if not text or not text.startswith("/"):
+        return ""
+    parts = text[1:].split(maxsplit=1)
+    return parts[0].split("@", 1)[0] if parts else ""
+
+
+def addressed_to_other_bot(text: str | None, bot_username: str | None) -> bool:
+    """В группах `/start@ДругойБот` адресован не нам."""
+    parts = (text or "").split(maxsplit=1)
+    mention = parts[0].partition("@")[2] if parts else ""
+    return bool(mention) and mention.lower() != (bot_username or "").lower()
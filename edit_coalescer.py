@@ -0,0 +1,84 @@
+"""Склейка частых правок одного сообщения в одну.
+
+Пользователь может быстро нажать несколько кнопок подряд. Вместо запроса
+`editMessageReplyMarkup` на каждое нажатие запоминаем последнее состояние и
+отправляем его один раз, когда нажатия стихнут на `settle` секунд (но не позже
+`max_delay` от первого нажатия). Если состояние совпадает с уже отправленным,
+правка не отправляется вовсе — так не бывает ошибок «message is not modified».
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Coroutine, Hashable
+
+from telegram.error import BadRequest
+
+Send = Callable[[Any], Awaitable[Any]]
+Spawn = Callable[[Coroutine[Any, Any, Any]], Any]
+
+
+class _Pending:
+    __slots__ = ("state", "send", "first", "last")
+
+    def __init__(self, state: Any, send: Send, now: float) -> None:
+        self.state = state
+        self.send = send
+        self.first = now
+        self.last = now
+
+
+class EditCoalescer:
+    def __init__(self, settle: float = 0.4, max_delay: float = 1.5, max_tracked: int = 10_000) -> None:
+        self.settle = settle
+        self.max_delay = max_delay
+        self.max_tracked = max_tracked
+        self._pending: dict[Hashable, _Pending] = {}
+        # ключ сообщения → последнее отправленное состояние
+        self._sent: OrderedDict[Hashable, Any] = OrderedDict()
+
+    def mark_sent(self, key: Hashable, state: Any) -> None:
+        """Запоминает состояние, которое уже видно пользователю."""
+        self._sent[key] = state
+        self._sent.move_to_end(key)
+        while len(self._sent) > self.max_tracked:
+            self._sent.popitem(last=False)
+
+    def request(self, key: Hashable, state: Any, send: Send, spawn: Spawn = asyncio.create_task) -> None:
+        """Планирует отправку `state` через `send(state)`; более новый запрос заменяет старый."""
+        now = time.monotonic()
+        pending = self._pending.get(key)
+        if pending is not None:
+            pending.state, pending.send, pending.last = state, send, now
+            return
+        self._pending[key] = _Pending(state, send, now)
+        spawn(self._flush_later(key))
+
+    def cancel(self, key: Hashable) -> None:
+        """Отменяет отложенную правку (например, сообщение уже заменено)."""
+        self._pending.pop(key, None)
+        self._sent.pop(key, None)
+
+    async def _flush_later(self, key: Hashable) -> None:
+        while True:
+            pending = self._pending.get(key)
+            if pending is None:
+                return  # отменено
+            deadline = min(pending.last + self.settle, pending.first + self.max_delay)
+            delay = deadline - time.monotonic()
+            if delay <= 0:
+                break
+            await asyncio.sleep(delay)
+
+        pending = self._pending.pop(key)
+        if key in self._sent and self._sent[key] == pending.state:
+            return
+        try:
+            await pending.send(pending.state)
+        except BadRequest as exc:
+            if "not modified" not in str(exc).lower():
+                logging.warning("Не удалось обновить клавиатуру: %s", exc)
+        except Exception as exc:  # noqa: BLE001 - логируем и продолжаем
+            logging.warning("Не удалось обновить клавиатуру: %s", exc)
+            return
+        self.mark_sent(key, pending.state)
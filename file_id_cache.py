@@ -0,0 +1,77 @@
+"""Постоянный кэш file_id Telegram для слайдов.
+
+Ключ — (id бота, SHA-256 содержимого файла): file_id действителен только для
+того бота, который загрузил файл, а хеш содержимого сам по себе инвалидирует
+запись, если файл заменили. Данные лежат в SQLite; при старте записи текущего
+бота поднимаются в словарь, и чтение из кэша не трогает диск.
+"""
+import asyncio
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+
+class FileIdCache:
+    def __init__(self, db_path: Path) -> None:
+        self.db_path = db_path
+        self.bot_id: int | None = None
+        self._ids: dict[str, str] = {}
+        self._conn: sqlite3.Connection | None = None
+        # Соединение используется из потоков asyncio.to_thread по очереди
+        self._lock = threading.Lock()
+
+    def open(self, bot_id: int) -> int:
+        """Открывает базу и загружает записи бота в память. Блокирующий вызов."""
+        with self._lock:
+            if self._conn is None:
+                self.db_path.parent.mkdir(parents=True, exist_ok=True)
+                self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS file_ids ("
+                    " bot_id INTEGER NOT NULL,"
+                    " sha256 TEXT NOT NULL,"
+                    " file_id TEXT NOT NULL,"
+                    " updated_at REAL NOT NULL,"
+                    " PRIMARY KEY (bot_id, sha256))"
+                )
+                self._conn.commit()
+            rows = self._conn.execute(
+                "SELECT sha256, file_id FROM file_ids WHERE bot_id = ?", (bot_id,)
+            ).fetchall()
+            self.bot_id = bot_id
+            self._ids = dict(rows)
+            return len(self._ids)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def get(self, digest: str | None) -> str | None:
+        if digest is None:
+            return None
+        return self._ids.get(digest)
+
+    def __contains__(self, digest: object) -> bool:
+        return digest in self._ids
+
+    def _store(self, items: list[tuple[str, str]]) -> None:
+        with self._lock:
+            if self._conn is None:
+                return
+            now = time.time()
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO file_ids (bot_id, sha256, file_id, updated_at) VALUES (?, ?, ?, ?)",
+                [(self.bot_id, digest, file_id, now) for digest, file_id in items],
+            )
+            self._conn.commit()
+
+    async def put_many(self, items: list[tuple[str, str]]) -> None:
+        """Запоминает пары (sha256, file_id): сразу в памяти, на диск — в потоке."""
+        items = [(d, f) for d, f in items if self._ids.get(d) != f]
+        if not items:
+            return
+        self._ids.update(items)
+        await asyncio.to_thread(self._store, items)
@@ -0,0 +1,172 @@
+"""Минимальный асинхронный HTTP/1.1 сервер без внешних зависимостей.
+
+Умеет ровно то, что нужно боту: запросы с Content-Length, keep-alive и
+аккуратную остановку с дожиданием запросов, которые уже в обработке.
+"""
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable
+from urllib.parse import parse_qs, urlsplit
+
+# Больше Telegram в вебхук не присылает; защищает от мусорных запросов
+MAX_BODY_SIZE = 16 * 1024 * 1024
+
+_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    403: "Forbidden",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+
+@dataclass
+class HttpRequest:
+    method: str
+    path: str
+    query: dict[str, list[str]]
+    headers: dict[str, str]
+    body: bytes
+    keep_alive: bool = True
+
+
+@dataclass
+class HttpResponse:
+    status: int = 200
+    body: bytes = b""
+    content_type: str = "application/json"
+    headers: dict[str, str] = field(default_factory=dict)
+
+
+Handler = Callable[[HttpRequest], Awaitable[HttpResponse]]
+
+
+class HttpError(Exception):
+    def __init__(self, status: int) -> None:
+        super().__init__(status)
+        self.status = status
+
+
+async def _read_line(reader: asyncio.StreamReader) -> bytes:
+    try:
+        return await reader.readline()
+    except ValueError:  # строка длиннее лимита StreamReader
+        raise HttpError(400) from None
+
+
+async def read_request(reader: asyncio.StreamReader) -> HttpRequest | None:
+    """Читает один запрос. None — клиент закрыл соединение."""
+    line = await _read_line(reader)
+    if not line:
+        return None
+    try:
+        method, target, version = line.decode("latin-1").split(maxsplit=2)
+    except ValueError:
+        raise HttpError(400) from None
+    headers: dict[str, str] = {}
+    while True:
+        raw = await _read_line(reader)
+        if raw in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = raw.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get("content-length", "0"))
+    except ValueError:
+        raise HttpError(400) from None
+    if length > MAX_BODY_SIZE:
+        raise HttpError(413)
+    body = await reader.readexactly(length) if length else b""
+    connection = headers.get("connection", "").lower()
+    keep_alive = connection != "close" if version.strip() == "HTTP/1.1" else connection == "keep-alive"
+    url = urlsplit(target)
+    return HttpRequest(method.upper(), url.path, parse_qs(url.query), headers, body, keep_alive)
+
+
+def write_response(writer: asyncio.StreamWriter, response: HttpResponse, keep_alive: bool) -> None:
+    head = [
+        f"HTTP/1.1 {response.status} {_REASONS.get(response.status, 'Unknown')}",
+        f"Content-Length: {len(response.body)}",
+        f"Connection: {'keep-alive' if keep_alive else 'close'}",
+    ]
+    if response.body:
+        head.append(f"Content-Type: {response.content_type}")
+    head.extend(f"{k}: {v}" for k, v in response.headers.items())
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + response.body)
+
+
+class HttpServer:
+    """Обслуживает соединения, передавая каждый запрос в `handler`."""
+
+    def __init__(self, handler: Handler, host: str, port: int) -> None:
+        self.handler = handler
+        self.host = host
+        self.port = port
+        self._server: asyncio.AbstractServer | None = None
+        self._connections: set[asyncio.Task] = set()
+        self._busy: set[asyncio.Task] = set()
+        self._closing = False
+
+    @property
+    def bound_port(self) -> int:
+        """Реальный порт (полезно, если слушали порт 0)."""
+        assert self._server is not None
+        return self._server.sockets[0].getsockname()[1]
+
+    async def start(self) -> None:
+        self._closing = False
+        self._server = await asyncio.start_server(self._serve_connection, self.host, self.port)
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Перестаёт принимать соединения и ждёт запросы, которые уже обрабатываются."""
+        self._closing = True
+        if self._server is not None:
+            self._server.close()
+        if self._busy:
+            await asyncio.wait(set(self._busy), timeout=timeout)
+        # Оставшиеся соединения простаивают в ожидании следующего запроса
+        for task in self._connections:
+            task.cancel()
+        await asyncio.gather(*self._connections, return_exceptions=True)
+        # С Python 3.12.1 wait_closed() ждёт закрытия всех клиентских соединений,
+        # поэтому зовём его только после того, как закрыли их сами
+        if self._server is not None:
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _serve_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        task = asyncio.current_task()
+        self._connections.add(task)
+        try:
+            while not self._closing:
+                try:
+                    request = await read_request(reader)
+                except HttpError as exc:
+                    write_response(writer, HttpResponse(exc.status), keep_alive=False)
+                    break
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                if request is None:
+                    break
+                self._busy.add(task)
+                try:
+                    response = await self.handler(request)
+                except Exception:  # noqa: BLE001 - один запрос не должен ронять сервер
+                    logging.exception("Ошибка обработки HTTP-запроса %s", request.path)
+                    response = HttpResponse(500)
+                finally:
+                    self._busy.discard(task)
+                keep_alive = request.keep_alive and not self._closing
+                write_response(writer, response, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.CancelledError, ConnectionError):
+            pass
+        finally:
+            self._connections.discard(task)
+            writer.close()
@@ -0,0 +1,90 @@
+"""Разбор свободного текста: к какой команде или категории квиза он относится.
+
+Ключевые слова берутся из content.json (`keywords` у команд и категорий) и
+приводятся к грубой основе: отрезается типичное русское окончание, так что
+«кухня», «кухню» и «кухней» совпадают. Из основ строится индекс
+основа → намерения; вес основы тем меньше, чем больше намерений её делят.
+
+Разбор сообщения — это разбиение на слова и несколько поисков в словаре,
+без сети и без внешних библиотек. Повторяющиеся фразы отдаются из LRU-кэша.
+"""
+import functools
+import re
+from dataclasses import dataclass
+
+from content import Content
+
+_WORD = re.compile(r"[а-яёa-z0-9]+")
+
+# Типичные окончания, от длинных к коротким; основа короче трёх букв не режется
+_ENDINGS = tuple(sorted((
+    "иями", "ами", "ями", "ого", "его", "ому", "ему", "ыми", "ими", "иях", "ией",
+    "ах", "ях", "ой", "ей", "ий", "ый", "ая", "яя", "ое", "ее", "ые", "ие", "ом", "ем",
+    "ам", "ям", "ую", "юю", "ов", "ев", "ию", "ия",
+    "ы", "и", "а", "я", "о", "е", "у", "ю", "ь", "й",
+), key=len, reverse=True))
+
+# Длиннее этого текст не разбираем: намерение обычно видно в начале
+MAX_TEXT_LENGTH = 500
+
+
+def stem(word: str) -> str:
+    word = word.replace("ё", "е")
+    for ending in _ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= 3:
+            return word[:-len(ending)]
+    return word
+
+
+def _stems(text: str) -> tuple[str, ...]:
+    return tuple(stem(w) for w in _WORD.findall(text.casefold()))
+
+
+@dataclass(frozen=True, slots=True)
+class Route:
+    # Команда, ответ на которую подходит к сообщению, иначе None (тогда — квиз по категориям)
+    command: str | None = None
+    # Категории квиза, упомянутые в сообщении (в порядке content.json)
+    categories: tuple[str, ...] = ()
+
+
+class IntentRouter:
+    def __init__(self, content: Content, cache_size: int = 4096) -> None:
+        self.content = content
+        # основа → [(("command" | "category", код), вес)]
+        index: dict[str, set[tuple[str, str]]] = {}
+        for name, cmd in content.commands.items():
+            for keyword in cmd.keywords:
+                for s in _stems(keyword):
+                    index.setdefault(s, set()).add(("command", name))
+        for code, keywords in content.category_keywords.items():
+            for keyword in keywords:
+                for s in _stems(keyword):
+                    index.setdefault(s, set()).add(("category", code))
+        self._index: dict[str, tuple[tuple[tuple[str, str], float], ...]] = {
+            s: tuple((intent, 1.0 / len(intents)) for intent in sorted(intents))
+            for s, intents in index.items()
+        }
+        self._category_order = {code: i for i, (code, _) in enumerate(content.categories)}
+        self._cached_route = functools.lru_cache(maxsize=cache_size)(self._route)
+
+    def route(self, text: str) -> Route | None:
+        # Обрезаем до кэша: ключом должен быть тот же текст, что разбирается
+        return self._cached_route(text[:MAX_TEXT_LENGTH])
+
+    def _route(self, text: str) -> Route | None:
+        scores: dict[tuple[str, str], float] = {}
+        for s in set(_stems(text)):
+            for intent, weight in self._index.get(s, ()):
+                scores[intent] = scores.get(intent, 0.0) + weight
+        if not scores:
+            return None
+        commands = {code: score for (kind, code), score in scores.items() if kind == "command"}
+        categories = {code: score for (kind, code), score in scores.items() if kind == "category"}
+        ordered = tuple(sorted(categories, key=self._category_order.__getitem__))
+        # Явная просьба («сколько стоит», «нужен замер») важнее упомянутой мебели
+        if commands:
+            best = max(sorted(commands), key=commands.__getitem__)
+            if commands[best] >= max(categories.values(), default=0.0):
+                return Route(command=best, categories=ordered)
+        return Route(categories=ordered)
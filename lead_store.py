@@ -0,0 +1,173 @@
+"""Заявки клиентов (замер, расчёт, визит в шоурум) в SQLite.
+
+Таблица только пополняется. Обработчик кладёт заявку в память через `add()`
+и сразу отвечает пользователю, а запись на диск идёт в фоне: всё, что
+накопилось, пока писалась предыдущая пачка, уходит одной транзакцией
+(групповой коммит). При ошибке записи пачка остаётся в очереди и
+повторяется через `retry_delay` секунд.
+
+`export()` выгружает заявки в CSV или JSON Lines постранично (по `id`), через
+отдельное соединение: в режиме WAL чтение не мешает записи, а в памяти
+одновременно лежит не больше одной страницы.
+"""
+import asyncio
+import csv
+import json
+import logging
+import sqlite3
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Iterator, Sequence
+
+# Колонки выгрузки до полей заявки
+BASE_COLUMNS = ("id", "created_at", "kind", "user_id", "chat_id", "username", "first_name")
+
+EXPORT_FORMATS = ("csv", "json")
+
+
+class LeadStore:
+    def __init__(self, db_path: Path, retry_delay: float = 5.0, page_size: int = 500) -> None:
+        self.db_path = db_path
+        self.retry_delay = retry_delay
+        self.page_size = page_size
+        self._conn: sqlite3.Connection | None = None
+        self._pending: list[tuple] = []
+        self._flush_task: asyncio.Task | None = None
+        self._closing = False
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS leads ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " created_at REAL NOT NULL,"
+                " kind TEXT NOT NULL,"
+                " user_id INTEGER,"
+                " chat_id INTEGER,"
+                " username TEXT,"
+                " first_name TEXT,"
+                " fields TEXT NOT NULL)"
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    # --- запись ---
+
+    def add(self, kind: str, fields: dict[str, str], user_id: int | None = None, chat_id: int | None = None,
+            username: str | None = None, first_name: str | None = None) -> None:
+        """Ставит заявку в очередь на запись; не ждёт диска."""
+        self._pending.append((
+            time.time(), kind, user_id, chat_id, username, first_name,
+            json.dumps(fields, ensure_ascii=False, separators=(",", ":")),
+        ))
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_pending())
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def _write(self, rows: list[tuple]) -> None:
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                "INSERT INTO leads (created_at, kind, user_id, chat_id, username, first_name, fields)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    async def _flush_pending(self) -> None:
+        # Дать соседним обработчикам добавить свои заявки в ту же пачку
+        await asyncio.sleep(0)
+        while self._pending:
+            rows, self._pending = self._pending, []
+            try:
+                await asyncio.to_thread(self._write, rows)
+            except Exception as exc:  # noqa: BLE001 - заявки не теряем, повторим позже
+                logging.warning("Не удалось сохранить %d заявок: %s", len(rows), exc)
+                self._pending[:0] = rows
+                if self._closing:
+                    return
+                await asyncio.sleep(self.retry_delay)
+
+    async def close(self) -> None:
+        """Дописывает очередь и закрывает базу."""
+        self._closing = True
+        if self._flush_task is not None:
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+        if self._pending:
+            rows, self._pending = self._pending, []
+            try:
+                await asyncio.to_thread(self._write, rows)
+            except Exception:  # noqa: BLE001 - последний шанс: заявки остаются в логе
+                logging.exception("Заявки не сохранены: %s", rows)
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    # --- выгрузка ---
+
+    def _pages(self, after_id: int) -> Iterator[list[tuple]]:
+        if not self.db_path.exists():
+            return
+        conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+        try:
+            while True:
+                try:
+                    rows = conn.execute(
+                        "SELECT id, created_at, kind, user_id, chat_id, username, first_name, fields"
+                        " FROM leads WHERE id > ? ORDER BY id LIMIT ?",
+                        (after_id, self.page_size),
+                    ).fetchall()
+                except sqlite3.OperationalError:  # таблицы ещё нет
+                    return
+                if not rows:
+                    return
+                yield rows
+                after_id = rows[-1][0]
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _record(row: tuple) -> dict[str, Any]:
+        record = dict(zip(BASE_COLUMNS, row))
+        record["created_at"] = datetime.fromtimestamp(row[1], timezone.utc).isoformat(timespec="seconds")
+        record["fields"] = json.loads(row[7])
+        return record
+
+    def export(self, path: Path, fmt: str, field_names: Sequence[str] = (), after_id: int = 0) -> int:
+        """Пишет заявки с `id > after_id` в файл; возвращает их число. Блокирующий — звать через to_thread.
+
+        В CSV поля заявки идут отдельными колонками в порядке `field_names`,
+        а незнакомые (например, из старой версии content.json) — JSON-ом в колонке `other`.
+        """
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"неизвестный формат выгрузки: {fmt}")
+        count = 0
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # BOM — чтобы Excel открыл CSV в UTF-8
+        with open(path, "w", encoding="utf-8-sig" if fmt == "csv" else "utf-8", newline="") as f:
+            writer = csv.writer(f) if fmt == "csv" else None
+            if writer:
+                writer.writerow([*BASE_COLUMNS, *field_names, "other"])
+            for rows in self._pages(after_id):
+                for row in rows:
+                    record = self._record(row)
+                    fields = record.pop("fields")
+                    if writer:
+                        other = {k: v for k, v in fields.items() if k not in field_names}
+                        writer.writerow([
+                            *(record[c] for c in BASE_COLUMNS),
+                            *(fields.get(name, "") for name in field_names),
+                            json.dumps(other, ensure_ascii=False) if other else "",
+                        ])
+                    else:
+                        f.write(json.dumps({**record, "fields": fields}, ensure_ascii=False) + "\n")
+                count += len(rows)
+        return count
@@ -0,0 +1,246 @@
+"""Логирование, которое не пишет в stderr из цикла событий.
+
+`configure()` ставит на корневой логгер `QueueHandler`: в обработчике запись
+только кладётся в очередь, а форматирование и вывод делает отдельный поток
+`QueueListener`. До очереди записи проходят два фильтра:
+
+* `ContextFilter` добавляет поля текущего обновления — update_id, chat_id,
+  имя обработчика и сколько миллисекунд прошло с начала обработки. Их
+  выставляют `update_context()` (в PerChatUpdateProcessor) и `tagged()`
+  (обёртка обработчика) через contextvars, так что они доходят и до задач,
+  и до `asyncio.to_thread`.
+* `SamplingFilter` прореживает однотипные записи: строку httpx на каждый
+  запрос к API, повторяющиеся предупреждения о клавиатуре. Из каждой группы
+  за `interval` секунд проходят первые `burst`, остальные отбрасываются, а
+  их число дописывается к следующей пропущенной записи группы.
+
+Формат вывода — прежний текстовый или JSON по строке на запись (`LOG_FORMAT=json`).
+"""
+import atexit
+import copy
+import functools
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Awaitable, Callable, Iterator
+
+from config import CONFIG_ERRORS, env_number
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+LOG_FORMATS = ("text", "json")
+
+_UPDATE_ID: ContextVar[int | None] = ContextVar("log_update_id", default=None)
+_CHAT_ID: ContextVar[int | None] = ContextVar("log_chat_id", default=None)
+_HANDLER: ContextVar[str | None] = ContextVar("log_handler", default=None)
+_STARTED: ContextVar[float | None] = ContextVar("log_started", default=None)
+
+
+@contextmanager
+def update_context(update: object) -> Iterator[None]:
+    """Поля обновления для всех записей, сделанных во время его обработки."""
+    chat = getattr(update, "effective_chat", None)
+    tokens = (
+        _UPDATE_ID.set(getattr(update, "update_id", None)),
+        _CHAT_ID.set(chat.id if chat else None),
+        _STARTED.set(time.perf_counter()),
+    )
+    try:
+        yield
+    finally:
+        for var, token in zip((_UPDATE_ID, _CHAT_ID, _STARTED), tokens):
+            var.reset(token)
+
+
+def tagged(handler: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+    """Обёртка обработчика, которая подписывает записи его именем."""
+    name = handler.__name__
+
+    @functools.wraps(handler)
+    async def wrapper(update: Any, context: Any) -> Any:
+        token = _HANDLER.set(name)
+        try:
+            return await handler(update, context)
+        finally:
+            _HANDLER.reset(token)
+
+    return wrapper
+
+
+class ContextFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.update_id = _UPDATE_ID.get()
+        record.chat_id = _CHAT_ID.get()
+        record.handler = _HANDLER.get()
+        started = _STARTED.get()
+        record.duration_ms = round((time.perf_counter() - started) * 1000, 1) if started is not None else None
+        return True
+
+
+@dataclass(frozen=True, slots=True)
+class SampleRule:
+    # Префикс имени логгера ("" — любой)
+    logger: str
+    # Правило действует на записи этого уровня и ниже
+    level: int
+    # Подстрока сообщения; None — все записи логгера
+    contains: str | None = None
+
+
+DEFAULT_RULES = (
+    # httpx пишет строку на каждый запрос к Bot API
+    SampleRule("httpx", logging.INFO),
+    SampleRule("", logging.WARNING, "not modified"),
+    SampleRule("", logging.WARNING, "Не удалось обновить клавиатуру"),
+)
+
+
+class SamplingFilter(logging.Filter):
+    def __init__(self, rules: tuple[SampleRule, ...], interval: float, burst: int) -> None:
+        super().__init__()
+        self.rules = rules
+        self.interval = interval
+        self.burst = burst
+        self._lock = threading.Lock()
+        # (правило, логгер, шаблон сообщения) → [начало окна, пропущено записей, отброшено записей]
+        self._windows: dict[tuple, list] = {}
+
+    def _rule_for(self, record: logging.LogRecord) -> int | None:
+        for i, rule in enumerate(self.rules):
+            if record.levelno > rule.level or not record.name.startswith(rule.logger):
+                continue
+            if rule.contains is None or rule.contains in record.getMessage():
+                return i
+        return None
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.suppressed = 0
+        if self.burst <= 0:
+            return True
+        rule = self._rule_for(record)
+        if rule is None:
+            return True
+        key = (rule, record.name, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                dropped = window[2] if window else 0
+                self._windows[key] = [now, 1, 0]
+                record.suppressed = dropped
+                return True
+            if window[1] < self.burst:
+                window[1] += 1
+                return True
+            window[2] += 1
+            return False
+
+
+class _QueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Как у QueueHandler: сообщение форматируется здесь, пока аргументы живы,
+        # но трассировка остаётся отдельным полем, а не склеивается с текстом
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        suppressed = getattr(record, "suppressed", 0)
+        return f"{text} (ещё {suppressed} похожих пропущено)" if suppressed else text
+
+
+class JsonFormatter(logging.Formatter):
+    _FIELDS = ("update_id", "chat_id", "handler", "duration_ms", "suppressed")
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: dict[str, Any] = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in self._FIELDS:
+            value = getattr(record, field, None)
+            if value:
+                entry[field] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+@dataclass(frozen=True, slots=True)
+class LogSettings:
+    # text или json
+    fmt: str = "text"
+    level: str = "INFO"
+    # Сколько однотипных записей пропускать за окно sample_interval секунд; 0 — не прореживать
+    sample_burst: int = 5
+    sample_interval: float = 60.0
+
+    @classmethod
+    def from_env(cls) -> "LogSettings":
+        """Настройки из LOG_FORMAT, LOG_LEVEL, LOG_SAMPLE_BURST и LOG_SAMPLE_INTERVAL.
+
+        Ошибки копятся в `config.CONFIG_ERRORS`, а вместо неверного значения
+        берётся значение по умолчанию.
+        """
+        default = cls()
+        fmt = os.getenv("LOG_FORMAT", default.fmt).lower()
+        if fmt not in LOG_FORMATS:
+            CONFIG_ERRORS.append(f"LOG_FORMAT={fmt!r}: ожидается text или json")
+            fmt = default.fmt
+        level = os.getenv("LOG_LEVEL", default.level).upper()
+        if not isinstance(logging.getLevelName(level), int):
+            CONFIG_ERRORS.append(f"LOG_LEVEL={level!r}: неизвестный уровень")
+            level = default.level
+        return cls(
+            fmt=fmt,
+            level=level,
+            sample_burst=env_number("LOG_SAMPLE_BURST", str(default.sample_burst), int),
+            sample_interval=env_number("LOG_SAMPLE_INTERVAL", str(default.sample_interval)),
+        )
+
+
+def configure(fmt: str = "text", level: str | int = logging.INFO, sample_interval: float = 60.0,
+              sample_burst: int = 5, rules: tuple[SampleRule, ...] = DEFAULT_RULES) -> QueueListener:
+    """Заменяет обработчики корневого логгера очередью с фоновым выводом в stderr."""
+    if fmt not in LOG_FORMATS:
+        raise ValueError(f"неизвестный формат логов: {fmt}")
+    output = logging.StreamHandler(sys.stderr)
+    output.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter(TEXT_FORMAT))
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    handler = _QueueHandler(records)
+    handler.addFilter(SamplingFilter(rules, sample_interval, sample_burst))
+    handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    for old in root.handlers[:]:
+        root.removeHandler(old)
+    root.addHandler(handler)
+    root.setLevel(level)
+
+    listener = QueueListener(records, output)
+    listener.start()
+    # Дописать очередь при выходе из процесса
+    atexit.register(listener.stop)
+    return listener
+
+
+def configure_from(settings: LogSettings) -> QueueListener:
+    """`configure()` с настройками из окружения (см. `LogSettings.from_env`)."""
+    return configure(settings.fmt, settings.level, settings.sample_interval, settings.sample_burst)
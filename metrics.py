@@ -0,0 +1,209 @@
+"""Встроенные метрики бота в текстовом формате Prometheus.
+
+Включаются переменной METRICS_ADDR (например, `127.0.0.1:9464`): тогда на
+`http://METRICS_ADDR/metrics` отдаются гистограммы задержек обработчиков и
+вызовов Bot API, счётчики ошибок и 429, попадания в кэш file_id, объём
+загрузок и отставание очереди обновлений.
+
+Когда METRICS_ADDR не задан, `REGISTRY.enabled` ложно: обработчики не
+оборачиваются вовсе, а остальные точки замера сводятся к одной проверке флага.
+"""
+import bisect
+import functools
+import logging
+import math
+import os
+import time
+from typing import Any, Awaitable, Callable
+
+from config import CONFIG_ERRORS
+from http_server import HttpRequest, HttpResponse, HttpServer
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BYTES_BUCKETS = (16e3, 64e3, 256e3, 1e6, 4e6, 16e6, 64e6)
+
+Labels = tuple[tuple[str, str], ...]
+
+
+def _fmt_labels(labels: Labels, extra: tuple[str, str] | None = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+def _fmt_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str) -> None:
+        self.name, self.help = name, help_text
+        self._values: dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_fmt_labels(k)} {_fmt_value(v)}" for k, v in sorted(self._values.items())]
+        return lines
+
+
+class Gauge:
+    """Значение снимается в момент запроса /metrics."""
+
+    def __init__(self, name: str, help_text: str, read: Callable[[], float]) -> None:
+        self.name, self.help, self.read = name, help_text, read
+
+    def render(self) -> list[str]:
+        try:
+            value = self.read()
+        except Exception:  # noqa: BLE001 - источник ещё не готов
+            return []
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge", f"{self.name} {_fmt_value(value)}"]
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.name, self.help = name, help_text
+        self.buckets = tuple(buckets)
+        # labels → [счётчики по корзинам..., сумма, количество]
+        self._series: dict[Labels, list[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, series in sorted(self._series.items()):
+            cumulative = 0.0
+            for le, n in zip(self.buckets + (math.inf,), series[:-2]):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{_fmt_labels(key, ('le', _fmt_value(le)))} {_fmt_value(cumulative)}")
+            lines.append(f"{self.name}_sum{_fmt_labels(key)} {_fmt_value(series[-2])}")
+            lines.append(f"{self.name}_count{_fmt_labels(key)} {_fmt_value(series[-1])}")
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self.enabled = False
+        self._metrics: list[Any] = []
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        metric = Counter(name, help_text)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help_text: str, buckets: tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, help_text, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name: str, help_text: str, read: Callable[[], float]) -> Gauge:
+        self._metrics = [m for m in self._metrics if m.name != name]
+        metric = Gauge(name, help_text, read)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HANDLER_SECONDS = REGISTRY.histogram("bot_handler_seconds", "Время работы обработчика")
+HANDLER_ERRORS = REGISTRY.counter("bot_handler_errors_total", "Исключения в обработчиках")
+API_SECONDS = REGISTRY.histogram("bot_api_request_seconds", "Длительность вызова Bot API")
+API_ERRORS = REGISTRY.counter("bot_api_errors_total", "Ошибки вызовов Bot API")
+API_FLOOD = REGISTRY.counter("bot_api_retry_after_total", "Ответы 429 (RetryAfter) от Bot API")
+SEND_WAIT_SECONDS = REGISTRY.histogram("bot_send_queue_wait_seconds", "Ожидание в планировщике отправки")
+FILE_ID_CACHE = REGISTRY.counter("bot_file_id_cache_total", "Обращения к кэшу file_id (result=hit|miss)")
+UPLOAD_BYTES = REGISTRY.histogram("bot_upload_bytes", "Байт загружено за один вызов отправки", BYTES_BUCKETS)
+UPDATE_SECONDS = REGISTRY.histogram("bot_update_seconds", "Полное время обработки обновления")
+UPDATE_LAG = REGISTRY.histogram("bot_update_lag_seconds", "Отставание: от даты нового сообщения до начала обработки")
+
+
+def instrument(handler: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+    """Оборачивает обработчик замером времени. При выключенных метриках возвращает его как есть."""
+    if not REGISTRY.enabled:
+        return handler
+    name = handler.__name__
+
+    @functools.wraps(handler)
+    async def wrapper(update: Any, context: Any) -> Any:
+        started = time.perf_counter()
+        try:
+            return await handler(update, context)
+        except Exception:
+            HANDLER_ERRORS.inc(handler=name)
+            raise
+        finally:
+            HANDLER_SECONDS.observe(time.perf_counter() - started, handler=name)
+
+    return wrapper
+
+
+def observe_update(update: Any, started: float, finished: float) -> None:
+    """Наблюдатель для PerChatUpdateProcessor.on_processed."""
+    UPDATE_SECONDS.observe(finished - started)
+    # Только новые сообщения: у нажатия кнопки effective_message — сообщение бота
+    # с квизом, а у правки — исходное сообщение, и их дата ничего не говорит об отставании
+    message = getattr(update, "message", None)
+    date = getattr(message, "date", None)
+    if date is not None:
+        # Дата сообщения с точностью до секунды — для отставания этого достаточно
+        began_wall = time.time() - (finished - started)
+        UPDATE_LAG.observe(max(0.0, began_wall - date.timestamp()))
+
+
+def parse_addr(addr: str) -> tuple[str, int]:
+    """`хост:порт` → (хост, порт); ValueError, если порт не число от 0 до 65535."""
+    host, _, port = addr.rpartition(":")
+    number = int(port)
+    if not 0 <= number <= 65535:
+        raise ValueError(port)
+    return host or "127.0.0.1", number
+
+
+class MetricsServer:
+    def __init__(self, addr: str) -> None:
+        host, port = parse_addr(addr)
+        self.server = HttpServer(self._handle, host, port)
+
+    async def _handle(self, request: HttpRequest) -> HttpResponse:
+        if request.path != "/metrics":
+            return HttpResponse(404)
+        if request.method != "GET":
+            return HttpResponse(405)
+        return HttpResponse(200, REGISTRY.render().encode(), "text/plain; version=0.0.4; charset=utf-8")
+
+    async def start(self) -> None:
+        await self.server.start()
+        logging.info("Метрики: http://%s:%s/metrics", self.server.host, self.server.bound_port)
+
+    async def stop(self) -> None:
+        await self.server.stop(timeout=1)
+
+
+METRICS_ADDR = os.getenv("METRICS_ADDR", "")
+if METRICS_ADDR:
+    try:
+        parse_addr(METRICS_ADDR)
+    except ValueError:
+        CONFIG_ERRORS.append(f"METRICS_ADDR={METRICS_ADDR!r}: ожидается хост:порт, например 127.0.0.1:9464")
+        METRICS_ADDR = ""
+REGISTRY.enabled = bool(METRICS_ADDR)
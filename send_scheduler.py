@@ -0,0 +1,305 @@
+"""Единый планировщик исходящих запросов к Bot API.
+
+Подключается как `rate_limiter` приложения, поэтому через него проходят все
+вызовы `context.bot`/`message.reply_*` без изменений в обработчиках.
+
+- Лимиты Telegram соблюдаются корзинами токенов: общая (~30 сообщений/с),
+  на личный чат (~1/с) и на группу (~20/мин).
+- Ответы пользователю (текст, правка клавиатуры) идут раньше тяжёлых
+  альбомов и фото; `answerCallbackQuery` и служебные методы не ограничиваются.
+- На `RetryAfter` запрос повторяется после указанной паузы со случайным
+  разбросом, чтобы повторы не пришли одной пачкой.
+
+Приоритет можно задать явно: `reply_photo(..., rate_limit_args={"priority": INTERACTIVE})`.
+"""
+import asyncio
+import bisect
+import logging
+import random
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Any, Callable, Coroutine
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+import metrics
+
+INTERACTIVE = 1
+NORMAL = 2
+BULK = 3
+
+_PRIORITY_NAMES = {INTERACTIVE: "interactive", NORMAL: "normal", BULK: "bulk"}
+
+# Методы, которые не расходуют лимит сообщений
+_UNLIMITED_ENDPOINTS = frozenset({
+    "answerCallbackQuery", "getMe", "getUpdates", "getFile", "getChat",
+    "setMyCommands", "getMyCommands", "setWebhook", "deleteWebhook", "getWebhookInfo",
+    "deleteMessage", "deleteMessages", "sendChatAction",
+})
+
+_INTERACTIVE_ENDPOINTS = frozenset({
+    "sendMessage", "editMessageText", "editMessageReplyMarkup", "editMessageCaption",
+})
+
+_BULK_ENDPOINTS = frozenset({
+    "sendMediaGroup", "sendPhoto", "sendDocument", "sendVideo", "sendAnimation", "copyMessages",
+})
+
+
+def priority_for(endpoint: str) -> int:
+    if endpoint in _INTERACTIVE_ENDPOINTS:
+        return INTERACTIVE
+    if endpoint in _BULK_ENDPOINTS:
+        return BULK
+    return NORMAL
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated", "blocked_until")
+
+    def __init__(self, rate: float, capacity: float, now: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+        self.blocked_until = 0.0
+
+    def _fill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now: float, cost: float) -> float:
+        """Через сколько секунд хватит токенов на `cost` (0 — можно сейчас)."""
+        self._fill(now)
+        wait = max(0.0, self.blocked_until - now)
+        # Стоимость больше ёмкости (большой альбом) пропускаем при полной корзине
+        need = min(cost, self.capacity)
+        if self.tokens < need:
+            wait = max(wait, (need - self.tokens) / self.rate)
+        return wait
+
+    def take(self, cost: float) -> None:
+        self.tokens -= cost
+
+    def is_idle(self, now: float) -> bool:
+        self._fill(now)
+        return self.tokens >= self.capacity and self.blocked_until <= now
+
+
+@dataclass(order=True)
+class _Job:
+    priority: int
+    seq: int
+    chat_id: Any = field(compare=False)
+    cost: int = field(compare=False)
+    enqueued: float = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+
+
+class SendScheduler(BaseRateLimiter[dict[str, Any]]):
+    def __init__(
+        self,
+        global_rate: float = 30.0,
+        chat_rate: float = 1.0,
+        chat_burst: float = 3.0,
+        group_rate: float = 20 / 60,
+        group_burst: float = 3.0,
+        max_retries: int = 3,
+        jitter: float = 1.0,
+    ) -> None:
+        self.global_rate = global_rate
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self.group_burst = group_burst
+        self.max_retries = max_retries
+        self.jitter = jitter
+
+        self._global: TokenBucket | None = None
+        self._chats: dict[Any, TokenBucket] = {}
+        self._queue: list[_Job] = []
+        self._seq = 0
+        self._wakeup: asyncio.Event | None = None
+        self._dispatcher: asyncio.Task | None = None
+
+        # Статистика
+        self.max_depth = 0
+        self.retries = 0
+        self.granted: dict[int, int] = {p: 0 for p in _PRIORITY_NAMES}
+        self.wait_total: dict[int, float] = {p: 0.0 for p in _PRIORITY_NAMES}
+        self._recent_waits: deque[float] = deque(maxlen=1000)
+
+    async def initialize(self) -> None:
+        # PTB вызывает initialize дважды: для бота приложения и для бота Updater
+        if self._dispatcher is not None:
+            return
+        self._global = TokenBucket(self.global_rate, self.global_rate, time.monotonic())
+        self._wakeup = asyncio.Event()
+        self._dispatcher = asyncio.create_task(self._dispatch(), name="SendScheduler:dispatch")
+
+    async def shutdown(self) -> None:
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            await asyncio.gather(self._dispatcher, return_exceptions=True)
+            self._dispatcher = None
+        for job in self._queue:
+            job.future.cancel()
+        self._queue.clear()
+
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, bool | dict[str, Any] | list[dict[str, Any]]]],
+        args: Any,
+        kwargs: dict[str, Any],
+        endpoint: str,
+        data: dict[str, Any],
+        rate_limit_args: dict[str, Any] | None,
+    ) -> bool | dict[str, Any] | list[dict[str, Any]]:
+        if endpoint in _UNLIMITED_ENDPOINTS:
+            return await self._call(endpoint, callback, args, kwargs)
+
+        rate_limit_args = rate_limit_args or {}
+        priority = rate_limit_args.get("priority") or priority_for(endpoint)
+        max_retries = rate_limit_args.get("max_retries", self.max_retries)
+        chat_id = data.get("chat_id")
+        # Telegram считает каждое фото альбома отдельным сообщением
+        cost = len(data.get("media") or ()) if endpoint == "sendMediaGroup" else 1
+
+        attempt = 0
+        while True:
+            await self._acquire(priority, chat_id, max(cost, 1))
+            try:
+                return await self._call(endpoint, callback, args, kwargs)
+            except RetryAfter as exc:
+                if attempt >= max_retries:
+                    raise
+                attempt += 1
+                retry_after = exc.retry_after
+                if isinstance(retry_after, timedelta):
+                    retry_after = retry_after.total_seconds()
+                self.retries += 1
+                self._block(chat_id, float(retry_after))
+                delay = float(retry_after) + random.uniform(0, self.jitter)
+                logging.warning("%s: RetryAfter %ss, повтор через %.1f с", endpoint, retry_after, delay)
+                await asyncio.sleep(delay)
+
+    @staticmethod
+    async def _call(endpoint: str, callback: Callable[..., Coroutine[Any, Any, Any]], args: Any,
+                    kwargs: dict[str, Any]) -> Any:
+        if not metrics.REGISTRY.enabled:
+            return await callback(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return await callback(*args, **kwargs)
+        except RetryAfter:
+            metrics.API_FLOOD.inc(method=endpoint)
+            raise
+        except Exception as exc:
+            metrics.API_ERRORS.inc(method=endpoint, error=type(exc).__name__)
+            raise
+        finally:
+            metrics.API_SECONDS.observe(time.perf_counter() - started, method=endpoint)
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    def stats(self) -> dict[str, Any]:
+        waits = sorted(self._recent_waits)
+
+        def pct(q: float) -> float:
+            return waits[min(len(waits) - 1, int(q * len(waits)))] if waits else 0.0
+
+        return {
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_depth,
+            "retries": self.retries,
+            "chats_tracked": len(self._chats),
+            "granted": {_PRIORITY_NAMES[p]: n for p, n in self.granted.items()},
+            "wait_seconds_total": {_PRIORITY_NAMES[p]: round(t, 3) for p, t in self.wait_total.items()},
+            "wait_seconds_p50": round(pct(0.5), 4),
+            "wait_seconds_p95": round(pct(0.95), 4),
+            "wait_seconds_max": round(waits[-1], 4) if waits else 0.0,
+        }
+
+    async def _acquire(self, priority: int, chat_id: Any, cost: int) -> None:
+        loop = asyncio.get_running_loop()
+        self._seq += 1
+        job = _Job(priority, self._seq, chat_id, cost, time.monotonic(), loop.create_future())
+        bisect.insort(self._queue, job)
+        self.max_depth = max(self.max_depth, len(self._queue))
+        self._wakeup.set()
+        await job.future
+
+    def _chat_bucket(self, chat_id: Any, now: float) -> TokenBucket | None:
+        if chat_id is None:
+            return None
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            # Отрицательные id — группы и каналы, у них свой (меньший) лимит
+            is_group = isinstance(chat_id, str) or chat_id < 0
+            rate, burst = (self.group_rate, self.group_burst) if is_group else (self.chat_rate, self.chat_burst)
+            bucket = self._chats[chat_id] = TokenBucket(rate, burst, now)
+        return bucket
+
+    def _block(self, chat_id: Any, seconds: float) -> None:
+        now = time.monotonic()
+        bucket = self._chat_bucket(chat_id, now) or self._global
+        bucket.blocked_until = max(bucket.blocked_until, now + seconds)
+
+    async def _dispatch(self) -> None:
+        while True:
+            if not self._queue:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            wait = self._grant_ready(time.monotonic())
+            if wait is None:
+                continue
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+            except asyncio.TimeoutError:
+                pass
+
+    def _grant_ready(self, now: float) -> float | None:
+        """Выдаёт разрешение первой готовой задаче по приоритету.
+
+        Возвращает None, если разрешение выдано, иначе — сколько ждать.
+        """
+        wait: float | None = None
+        for i, job in enumerate(self._queue):
+            if job.future.done():  # вызывающий отменил ожидание
+                del self._queue[i]
+                return None
+            global_delay = self._global.delay(now, job.cost)
+            if global_delay > 0:
+                # Общий лимит касается всех: младшие задачи не должны обгонять
+                return global_delay if wait is None else min(wait, global_delay)
+            bucket = self._chat_bucket(job.chat_id, now)
+            chat_delay = bucket.delay(now, 1) if bucket else 0.0
+            if chat_delay > 0:
+                wait = chat_delay if wait is None else min(wait, chat_delay)
+                continue
+            del self._queue[i]
+            self._global.take(job.cost)
+            if bucket:
+                bucket.take(1)
+            waited = now - job.enqueued
+            self.granted[job.priority] = self.granted.get(job.priority, 0) + 1
+            self.wait_total[job.priority] = self.wait_total.get(job.priority, 0.0) + waited
+            self._recent_waits.append(waited)
+            if metrics.REGISTRY.enabled:
+                metrics.SEND_WAIT_SECONDS.observe(waited, priority=_PRIORITY_NAMES[job.priority])
+            job.future.set_result(None)
+            if len(self._chats) > 10_000:
+                self._prune(now)
+            return None
+        return wait
+
+    def _prune(self, now: float) -> None:
+        for chat_id in [c for c, b in self._chats.items() if b.is_idle(now)]:
+            del self._chats[chat_id]
@@ -0,0 +1,269 @@
+"""Хранение `user_data` и `bot_data` между перезапусками в SQLite.
+
+Подключается как `persistence` приложения. PTB сам отмечает пользователей,
+чьи обновления обрабатывались, и раз в `update_interval` секунд передаёт их
+данные сюда; мы сравниваем их с последней записанной версией и отправляем на
+диск только изменённые — одной транзакцией в фоновом потоке, так что цикл
+событий на запись не ждёт. База в режиме WAL.
+
+Данные пользователя не читаются при старте: они подгружаются при первом его
+обновлении после перезапуска. Сессии, которые не трогали дольше `ttl`
+секунд, возвращает `expired()` — их нужно сбросить через
+`Application.drop_user_data`, после чего они удалятся и из памяти, и из базы.
+
+Всё, что кладётся в `user_data` и `bot_data`, должно сериализоваться в JSON.
+"""
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+
+def _dumps(data: dict) -> str | None:
+    """JSON данных или None для пустых (строку тогда можно удалить)."""
+    if not data:
+        return None
+    return json.dumps(data, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+
+
+class SqlitePersistence(BasePersistence[dict, dict, dict]):
+    def __init__(self, db_path: Path, ttl: float = 72 * 3600, update_interval: float = 5) -> None:
+        super().__init__(
+            store_data=PersistenceInput(bot_data=True, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval,
+        )
+        self.db_path = db_path
+        self.ttl = ttl
+        self._conn: sqlite3.Connection | None = None
+        # Соединение используется из потоков asyncio.to_thread по очереди
+        self._lock = threading.Lock()
+        # user_id → JSON, который сейчас лежит в базе (None — строки нет).
+        # Наличие ключа означает, что данные пользователя уже подгружены.
+        self._written: dict[int, str | None] = {}
+        self._loading: dict[int, asyncio.Future] = {}
+        self._last_seen: dict[int, float] = {}
+        self._bot_written: str | None = None
+        # Ждут записи: user_id → JSON (None — удалить), отметки активности, bot_data
+        self._pending: dict[int, str | None] = {}
+        self._touched: set[int] = set()
+        self._pending_bot: str | None = None
+        self._bot_dirty = False
+        # Пачка, которая пишется прямо сейчас
+        self._writing: dict[int, str | None] = {}
+        self._flush_task: asyncio.Task | None = None
+
+    # --- база ---
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS user_data ("
+                " user_id INTEGER PRIMARY KEY,"
+                " data TEXT NOT NULL,"
+                " updated_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS bot_data ("
+                " id INTEGER PRIMARY KEY CHECK (id = 0),"
+                " data TEXT NOT NULL)"
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _read_user(self, user_id: int) -> str | None:
+        with self._lock:
+            row = self._connect().execute("SELECT data FROM user_data WHERE user_id = ?", (user_id,)).fetchone()
+        return row[0] if row else None
+
+    def _read_bot(self) -> str | None:
+        with self._lock:
+            row = self._connect().execute("SELECT data FROM bot_data WHERE id = 0").fetchone()
+        return row[0] if row else None
+
+    def _write(self, users: dict[int, str | None], touched: set[int], bot: str | None, bot_dirty: bool,
+               purge_before: float | None = None) -> None:
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO user_data (user_id, data, updated_at) VALUES (?, ?, ?)",
+                    [(uid, raw, now) for uid, raw in users.items() if raw is not None],
+                )
+                conn.executemany(
+                    "DELETE FROM user_data WHERE user_id = ?",
+                    [(uid,) for uid, raw in users.items() if raw is None],
+                )
+                conn.executemany(
+                    "UPDATE user_data SET updated_at = ? WHERE user_id = ?",
+                    [(now, uid) for uid in touched if uid not in users],
+                )
+                if bot_dirty:
+                    if bot is None:
+                        conn.execute("DELETE FROM bot_data WHERE id = 0")
+                    else:
+                        conn.execute("INSERT OR REPLACE INTO bot_data (id, data) VALUES (0, ?)", (bot,))
+                if purge_before is not None:
+                    conn.execute("DELETE FROM user_data WHERE updated_at < ?", (purge_before,))
+
+    def _take_pending(self) -> tuple[dict[int, str | None], set[int], str | None, bool]:
+        batch = (self._pending, self._touched, self._pending_bot, self._bot_dirty)
+        self._pending, self._touched, self._bot_dirty = {}, set(), False
+        return batch
+
+    def _restore_pending(self, users: dict[int, str | None], touched: set[int], bot: str | None,
+                         bot_dirty: bool) -> None:
+        # Более новые изменения, пришедшие во время записи, важнее
+        for uid, raw in users.items():
+            self._pending.setdefault(uid, raw)
+        self._touched |= touched
+        if bot_dirty and not self._bot_dirty:
+            self._pending_bot, self._bot_dirty = bot, True
+
+    def _schedule_flush(self) -> None:
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_pending())
+
+    async def _flush_pending(self) -> None:
+        # Дать `update_persistence` отдать всю пачку, чтобы записать её одной транзакцией
+        await asyncio.sleep(0)
+        while self._pending or self._touched or self._bot_dirty:
+            batch = self._take_pending()
+            self._writing = batch[0]
+            try:
+                await asyncio.to_thread(self._write, *batch)
+            except Exception as exc:  # noqa: BLE001 - повторим при следующей записи
+                logging.warning("Не удалось сохранить сессии: %s", exc)
+                self._restore_pending(*batch)
+                return
+            finally:
+                self._writing = {}
+
+    # --- пользователи ---
+
+    async def get_user_data(self) -> dict[int, dict]:
+        # Ничего не читаем заранее — см. refresh_user_data
+        return {}
+
+    async def refresh_user_data(self, user_id: int, user_data: dict) -> None:
+        self._last_seen[user_id] = time.monotonic()
+        if user_id in self._written:
+            return
+        loading = self._loading.get(user_id)
+        if loading is None:
+            loading = self._loading[user_id] = asyncio.ensure_future(self._load_user(user_id, user_data))
+            loading.add_done_callback(lambda _: self._loading.pop(user_id, None))
+        await asyncio.shield(loading)
+
+    async def _load_user(self, user_id: int, user_data: dict) -> None:
+        # Ещё не записанная версия новее той, что в базе
+        if user_id in self._pending:
+            raw = self._pending[user_id]
+        elif user_id in self._writing:
+            raw = self._writing[user_id]
+        else:
+            raw = await asyncio.to_thread(self._read_user, user_id)
+        if raw is not None:
+            for key, value in json.loads(raw).items():
+                user_data.setdefault(key, value)
+        self._written[user_id] = raw
+
+    def loaded(self, user_id: int) -> bool:
+        """Подгружены ли данные пользователя (иначе `user_data` приложения для него пуст)."""
+        return user_id in self._written
+
+    async def update_user_data(self, user_id: int, data: dict) -> None:
+        self._last_seen[user_id] = time.monotonic()
+        if user_id not in self._written:
+            return  # данные не подгружались — что лежит в базе, неизвестно, не трогаем
+        raw = _dumps(data)
+        if raw == self._written[user_id]:
+            if raw is not None:
+                self._touched.add(user_id)
+                self._schedule_flush()
+            return
+        self._written[user_id] = raw
+        self._pending[user_id] = raw
+        self._schedule_flush()
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self._written.pop(user_id, None)
+        self._last_seen.pop(user_id, None)
+        self._touched.discard(user_id)
+        self._pending[user_id] = None
+        self._schedule_flush()
+
+    def expired(self) -> list[int]:
+        """Пользователи, которые не появлялись дольше `ttl` секунд."""
+        cutoff = time.monotonic() - self.ttl
+        return [uid for uid, seen in self._last_seen.items() if seen < cutoff]
+
+    async def purge_expired(self) -> None:
+        """Удаляет из базы сессии, не менявшиеся дольше `ttl` (в том числе ещё не подгруженные)."""
+        await asyncio.to_thread(self._write, {}, set(), None, False, time.time() - self.ttl)
+
+    # --- bot_data ---
+
+    async def get_bot_data(self) -> dict:
+        raw = await asyncio.to_thread(self._read_bot)
+        self._bot_written = raw
+        return json.loads(raw) if raw else {}
+
+    async def refresh_bot_data(self, bot_data: dict) -> None:
+        pass
+
+    async def update_bot_data(self, data: dict) -> None:
+        raw = _dumps(data)
+        if raw == self._bot_written:
+            return
+        self._bot_written = raw
+        self._pending_bot, self._bot_dirty = raw, True
+        self._schedule_flush()
+
+    # --- не используются: chat_data, callback_data и диалоги не хранятся ---
+
+    async def get_chat_data(self) -> dict[int, dict]:
+        return {}
+
+    async def update_chat_data(self, chat_id: int, data: dict) -> None:
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict) -> None:
+        pass
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        pass
+
+    async def get_callback_data(self) -> Any:
+        return None
+
+    async def update_callback_data(self, data: Any) -> None:
+        pass
+
+    async def get_conversations(self, name: str) -> dict:
+        return {}
+
+    async def update_conversation(self, name: str, key: tuple[int | str, ...], new_state: object | None) -> None:
+        pass
+
+    async def flush(self) -> None:
+        """Дописывает всё накопленное и закрывает базу (вызывается PTB при остановке)."""
+        if self._flush_task is not None:
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+        if self._pending or self._touched or self._bot_dirty:
+            await asyncio.to_thread(self._write, *self._take_pending())
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,207 @@
+"""Индекс слайдов: категория → упорядоченный список файлов.
+
+Каталог строится один раз при старте и дальше обновляется только для папок,
+у которых изменился mtime. Выдача слайдов категории — обычный поиск в словаре,
+без обращений к диску на каждый запрос.
+
+Для каждого файла хранится SHA-256 содержимого: по нему кэшируются file_id
+Telegram, поэтому изменённый файл (даже с тем же именем) получает новый ключ.
+Если задан `SlideDerivatives`, каталог отдаёт не исходники, а подготовленные
+для Telegram копии (и их хеши).
+"""
+import logging
+import os
+import re
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+
+from slide_derivatives import SlideDerivatives, file_digest
+
+SUPPORTED_IMAGE_EXTS: tuple[str, ...] = (".jpg", ".jpeg", ".png", ".webp")
+
+
+@dataclass(frozen=True)
+class _DirEntry:
+    """Снимок одной папки категории."""
+    mtime_ns: int
+    paths: tuple[Path, ...]
+
+
+def _order_slides(code: str, names: list[str]) -> list[str]:
+    """Упорядочивает имена файлов категории.
+
+    1) Сначала `<code>_<N>.<ext>` по возрастанию N (при одинаковом N берётся
+       расширение, стоящее раньше в SUPPORTED_IMAGE_EXTS).
+    2) Затем остальные поддерживаемые изображения по алфавиту.
+    """
+    pattern = re.compile(rf"^{re.escape(code)}_(\d+)$", re.IGNORECASE)
+    numbered: dict[int, tuple[int, str]] = {}
+    rest: list[str] = []
+    for name in names:
+        stem, ext = os.path.splitext(name)
+        ext = ext.lower()
+        if ext not in SUPPORTED_IMAGE_EXTS:
+            continue
+        m = pattern.match(stem)
+        if m:
+            n = int(m.group(1))
+            rank = SUPPORTED_IMAGE_EXTS.index(ext)
+            prev = numbered.get(n)
+            if prev is None or rank < prev[0]:
+                if prev is not None:
+                    rest.append(prev[1])
+                numbered[n] = (rank, name)
+                continue
+        rest.append(name)
+    rest.sort(key=str.lower)
+    return [numbered[n][1] for n in sorted(numbered)] + rest
+
+
+def _scan_dir(base: Path, code: str) -> _DirEntry | None:
+    try:
+        mtime_ns = base.stat().st_mtime_ns
+        with os.scandir(base) as it:
+            names = [e.name for e in it if e.is_file()]
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    return _DirEntry(mtime_ns, tuple(base / n for n in _order_slides(code, names)))
+
+
+class SlideCatalog:
+    """Кэш путей к слайдам по всем подпапкам `root`.
+
+    `get()`/`count()`/`digest()` только читают словари. `refresh()` и `reload()` ходят
+    на диск — их нужно вызывать вне event loop (например, через
+    `asyncio.to_thread`). Новый индекс собирается целиком и подменяется одной
+    операцией присваивания, поэтому читатели всегда видят согласованный снимок.
+    """
+
+    def __init__(self, root: Path, derivatives: SlideDerivatives | None = None) -> None:
+        self.root = root
+        self.derivatives = derivatives
+        self._index: dict[str, _DirEntry] = {}
+        # исходник → (size, mtime_ns, sha256)
+        self._digests: dict[Path, tuple[int, int, str]] = {}
+        # исходник → (sha256 исходника, файл для отправки, его sha256)
+        self._rendered: dict[Path, tuple[str, Path, str]] = {}
+        # то, что видят читатели: категория → файлы для отправки, файл → sha256
+        self._served: dict[str, tuple[Path, ...]] = {}
+        self._served_digests: dict[Path, str] = {}
+        self._root_mtime_ns: int | None = None
+        self._lock = threading.Lock()
+
+    def get(self, code: str) -> tuple[Path, ...]:
+        return self._served.get(code, ())
+
+    def count(self, code: str) -> int:
+        return len(self.get(code))
+
+    def digest(self, path: Path) -> str | None:
+        """SHA-256 файла, который вернул `get()`, на момент последнего обновления."""
+        return self._served_digests.get(path)
+
+    def codes(self) -> list[str]:
+        return sorted(self._index)
+
+    def reload(self) -> list[str]:
+        """Полностью пересобирает индекс. Возвращает список категорий."""
+        with self._lock:
+            self._root_mtime_ns = None
+            self._index = {}
+            self._digests = {}
+            self._rendered = {}
+            self._refresh_locked()
+            return self.codes()
+
+    def refresh(self) -> list[str]:
+        """Пересканирует только изменившиеся папки. Возвращает их коды."""
+        with self._lock:
+            return self._refresh_locked()
+
+    def _refresh_locked(self) -> list[str]:
+        try:
+            root_mtime_ns = self.root.stat().st_mtime_ns
+        except FileNotFoundError:
+            changed = list(self._index)
+            self._index, self._digests, self._root_mtime_ns = {}, {}, None
+            self._rendered, self._served, self._served_digests = {}, {}, {}
+            return changed
+
+        if root_mtime_ns != self._root_mtime_ns:
+            # Добавились/удалились папки категорий
+            with os.scandir(self.root) as it:
+                codes = sorted(e.name for e in it if e.is_dir() and not e.name.startswith("."))
+        else:
+            codes = list(self._index)
+
+        new_index: dict[str, _DirEntry] = {}
+        changed: list[str] = []
+        for code in codes:
+            base = self.root / code
+            old = self._index.get(code)
+            try:
+                mtime_ns = base.stat().st_mtime_ns
+            except FileNotFoundError:
+                continue
+            if old is not None and old.mtime_ns == mtime_ns:
+                new_index[code] = old
+                continue
+            entry = _scan_dir(base, code)
+            if entry is None:
+                continue
+            new_index[code] = entry
+            changed.append(code)
+        changed.extend(code for code in self._index if code not in new_index)
+
+        # Файл могли перезаписать на месте — mtime папки при этом не меняется
+        new_digests: dict[Path, tuple[int, int, str]] = {}
+        for code, entry in new_index.items():
+            for path in entry.paths:
+                try:
+                    st = path.stat()
+                    old_meta = self._digests.get(path)
+                    if old_meta and old_meta[:2] == (st.st_size, st.st_mtime_ns):
+                        new_digests[path] = old_meta
+                        continue
+                    new_digests[path] = (st.st_size, st.st_mtime_ns, file_digest(path))
+                except FileNotFoundError:
+                    continue
+                if code not in changed:
+                    changed.append(code)
+
+        rendered = self._render(new_digests)
+
+        self._index = new_index
+        self._digests = new_digests
+        self._rendered = rendered
+        self._served = {
+            code: tuple(rendered[p][1] for p in entry.paths if p in rendered)
+            for code, entry in new_index.items()
+        }
+        self._served_digests = {served: digest for _, served, digest in rendered.values()}
+        self._root_mtime_ns = root_mtime_ns
+        if changed and self.derivatives is not None:
+            self.derivatives.prune({served for _, served, _ in rendered.values()})
+        if changed:
+            logging.info("Каталог слайдов обновлён: %s", ", ".join(changed))
+        return changed
+
+    def _render(self, digests: dict[Path, tuple[int, int, str]]) -> dict[Path, tuple[str, Path, str]]:
+        """Сопоставляет исходникам файлы для отправки, обрабатывая только новые."""
+        rendered: dict[Path, tuple[str, Path, str]] = {}
+        todo: dict[Path, str] = {}
+        for path, (_, _, digest) in digests.items():
+            old = self._rendered.get(path)
+            if old is not None and old[0] == digest:
+                rendered[path] = old
+            else:
+                todo[path] = digest
+        if todo:
+            if self.derivatives is None:
+                built = {p: (p, d) for p, d in todo.items()}
+            else:
+                built = self.derivatives.build(todo)
+            for path, (served, served_digest) in built.items():
+                rendered[path] = (todo[path], served, served_digest)
+        return rendered
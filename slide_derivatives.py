@@ -0,0 +1,133 @@
+"""Подготовка слайдов к отправке в Telegram.
+
+Дизайнеры кладут в `slides/` исходники в полном разрешении, а Telegram всё
+равно пережимает фото до ~1280px. Чтобы не гонять лишние мегабайты, каждый
+слайд один раз уменьшается до MAX_SIDE по длинной стороне и сохраняется как
+JPEG. Результаты лежат в кэше на диске под именем `<sha256 исходника>-<параметры>.jpg`,
+так что повторно обрабатываются только новые или изменённые файлы.
+Обработка идёт в пуле процессов — по процессу на ядро.
+
+Pillow и пул процессов импортируются только там, где нужны (в дочернем
+процессе и при сборке), чтобы не замедлять запуск бота.
+"""
+import hashlib
+import importlib.util
+import logging
+import os
+import shutil
+from pathlib import Path
+
+# Значения по умолчанию; бот берёт свои из SLIDE_MAX_SIDE и SLIDE_JPEG_QUALITY
+MAX_SIDE = 1280
+JPEG_QUALITY = 82
+
+
+def file_digest(path: Path) -> str:
+    """SHA-256 содержимого файла: имя производной и ключ кэша file_id."""
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _render(source: str, target: str, max_side: int, quality: int) -> str:
+    """Делает производный JPEG. Выполняется в дочернем процессе.
+
+    Возвращает SHA-256 получившегося файла.
+    """
+    from PIL import Image, ImageOps
+
+    src, dst = Path(source), Path(target)
+    tmp = dst.with_name(dst.name + ".tmp")
+    with Image.open(src) as im:
+        im = ImageOps.exif_transpose(im)
+        if im.mode in ("RGBA", "LA", "P"):
+            # JPEG без альфа-канала: кладём прозрачность на белый фон
+            im = im.convert("RGBA")
+            background = Image.new("RGB", im.size, (255, 255, 255))
+            background.paste(im, mask=im.getchannel("A"))
+            im = background
+        elif im.mode != "RGB":
+            im = im.convert("RGB")
+        fits = max(im.size) <= max_side
+        im.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+        im.save(tmp, "JPEG", quality=quality, optimize=True, progressive=True)
+    # Небольшой JPEG пережимать бессмысленно, если он получился не меньше исходника
+    if fits and src.suffix.lower() in (".jpg", ".jpeg") and tmp.stat().st_size >= src.stat().st_size:
+        shutil.copyfile(src, tmp)
+    os.replace(tmp, dst)
+    return file_digest(dst)
+
+
+class SlideDerivatives:
+    """Кэш производных слайдов в `cache_dir`."""
+
+    def __init__(self, cache_dir: Path, max_side: int = MAX_SIDE, quality: int = JPEG_QUALITY,
+                 workers: int | None = None) -> None:
+        self.cache_dir = cache_dir
+        self.max_side = max_side
+        self.quality = quality
+        self.workers = workers
+        # Pillow не установлен — отдаём исходники как есть
+        self.enabled = importlib.util.find_spec("PIL") is not None
+        if not self.enabled:
+            logging.warning("Pillow не установлен: слайды отправляются без предобработки")
+
+    def target_for(self, digest: str) -> Path:
+        return self.cache_dir / f"{digest}-{self.max_side}q{self.quality}.jpg"
+
+    def build(self, sources: dict[Path, str]) -> dict[Path, tuple[Path, str]]:
+        """Готовит производные для {исходник: sha256}. Блокирующий вызов.
+
+        Возвращает {исходник: (файл для отправки, его sha256)}. Если обработать
+        файл не удалось, отправляется исходник.
+        """
+        result: dict[Path, tuple[Path, str]] = {p: (p, d) for p, d in sources.items()}
+        if not self.enabled or not sources:
+            return result
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        targets = {source: self.target_for(digest) for source, digest in sources.items()}
+        ready: dict[Path, str] = {}
+        # Одинаковые файлы в разных категориях обрабатываем один раз
+        pending: dict[Path, Path] = {}
+        for source, target in targets.items():
+            if target in ready or target in pending:
+                continue
+            if target.exists():
+                ready[target] = file_digest(target)
+            else:
+                pending[target] = source
+
+        if pending:
+            logging.info("Подготовка производных слайдов: %d файлов", len(pending))
+            workers = min(self.workers or os.cpu_count() or 1, len(pending))
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+
+            # spawn: бот работает с потоками, а fork из многопоточного процесса небезопасен
+            ctx = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+                futures = {
+                    target: pool.submit(_render, str(source), str(target), self.max_side, self.quality)
+                    for target, source in pending.items()
+                }
+                for target, future in futures.items():
+                    try:
+                        ready[target] = future.result()
+                    except Exception as exc:  # noqa: BLE001 - битый файл не должен ронять сборку
+                        logging.warning("Не удалось обработать слайд %s: %s", pending[target], exc)
+
+        for source, target in targets.items():
+            if target in ready:
+                result[source] = (target, ready[target])
+        return result
+
+    def prune(self, keep: set[Path]) -> None:
+        """Удаляет из кэша производные, которые больше не нужны."""
+        if not self.cache_dir.exists():
+            return
+        for p in self.cache_dir.glob("*.jpg"):
+            if p not in keep:
+                p.unlink(missing_ok=True)
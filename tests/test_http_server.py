@@ -0,0 +1,46 @@
+"""Разбор запросов во встроенном HTTP-сервере."""
+import asyncio
+
+import pytest
+
+from http_server import HttpError, read_request
+
+
+def _reader(data: bytes, limit: int = 2 ** 16) -> asyncio.StreamReader:
+    reader = asyncio.StreamReader(limit=limit)
+    reader.feed_data(data)
+    reader.feed_eof()
+    return reader
+
+
+def test_keep_alive_request() -> None:
+    async def scenario() -> None:
+        request = await read_request(_reader(
+            b"POST /hook?x=1 HTTP/1.1\r\nContent-Length: 2\r\nX-Test: a\r\n\r\n{}"
+        ))
+        assert request is not None
+        assert (request.method, request.path, request.query) == ("POST", "/hook", {"x": ["1"]})
+        assert request.headers["x-test"] == "a"
+        assert request.body == b"{}"
+        assert request.keep_alive
+
+    asyncio.run(scenario())
+
+
+def test_header_over_reader_limit_is_bad_request() -> None:
+    async def scenario() -> None:
+        data = b"POST / HTTP/1.1\r\nX-Long: " + b"a" * 200 + b"\r\n\r\n"
+        with pytest.raises(HttpError) as exc:
+            await read_request(_reader(data, limit=64))
+        assert exc.value.status == 400
+
+    asyncio.run(scenario())
+
+
+def test_body_too_large() -> None:
+    async def scenario() -> None:
+        with pytest.raises(HttpError) as exc:
+            await read_request(_reader(b"POST / HTTP/1.1\r\nContent-Length: 999999999\r\n\r\n"))
+        assert exc.value.status == 413
+
+    asyncio.run(scenario())
@@ -0,0 +1,92 @@
+"""Заявки и ответы в теле вебхука после перезапуска бота."""
+import asyncio
+import functools
+import json
+from pathlib import Path
+
+import pytest
+
+from bench.fake_bot_api import FakeBotApi
+from http_server import HttpRequest
+from session_store import SqlitePersistence
+from webhook import SECRET_HEADER, WebhookConfig, WebhookHandler
+
+TOKEN = "123456:TEST"
+SECRET = "s3cret"
+USER_ID = 42
+
+
+@pytest.fixture(scope="module")
+def bot(tmp_path_factory: pytest.TempPathFactory):
+    # bot.py читает настройки при импорте
+    tmp = tmp_path_factory.mktemp("bot")
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv("BOT_TOKEN", TOKEN)
+        mp.setenv("DATA_DIR", str(tmp / "data"))
+        mp.setenv("SLIDES_DIR", str(tmp / "slides"))
+        mp.setenv("SLIDES_REFRESH_INTERVAL", "0")
+        mp.setenv("CONTENT_REFRESH_INTERVAL", "0")
+        import bot
+        yield bot
+
+
+def _command(text: str, update_id: int) -> bytes:
+    return json.dumps({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": USER_ID, "type": "private"},
+            "from": {"id": USER_ID, "is_bot": False, "first_name": "Ann"},
+            "text": text,
+            "entities": [{"type": "bot_command", "offset": 0, "length": len(text)}],
+        },
+    }).encode()
+
+
+async def _seed_lead(db_path: Path) -> None:
+    """Сессия с начатой заявкой, как её оставил бот до перезапуска."""
+    persistence = SqlitePersistence(db_path)
+    await persistence.refresh_user_data(USER_ID, {})
+    await persistence.update_user_data(USER_ID, {"lead": {"command": "measure", "answers": {}}})
+    await persistence.flush()
+
+
+async def _until(condition, timeout: float = 5.0) -> None:
+    for _ in range(int(timeout / 0.02)):
+        if condition():
+            return
+        await asyncio.sleep(0.02)
+    raise AssertionError("не дождались обработки обновления")
+
+
+def test_command_after_restart_cancels_stored_lead(bot) -> None:
+    async def scenario() -> None:
+        await _seed_lead(bot.PERSISTENCE.db_path)
+        api = FakeBotApi()
+        await api.start()
+        application = bot.build_application(TOKEN, base_url=api.base_url)
+        await application.initialize()
+        await application.start()
+        try:
+            config = WebhookConfig(url="https://example.com/hook", path="/hook", secret_token=SECRET)
+            handler = WebhookHandler(
+                application, config, functools.partial(bot.inline_reply, user_data=application.user_data),
+            )
+
+            # Сессия ещё не подгружена: команду обрабатывает обработчик, и он прерывает заявку
+            response = await handler(HttpRequest("POST", "/hook", {}, {SECRET_HEADER: SECRET}, _command("/help", 1)))
+            assert response.body == b""
+            await _until(lambda: api.calls["sendMessage"] == 1)
+            assert "lead" not in application.user_data[USER_ID]
+
+            # Теперь о заявке всё известно, и команду можно ответить в теле вебхука
+            response = await handler(HttpRequest("POST", "/hook", {}, {SECRET_HEADER: SECRET}, _command("/help", 2)))
+            assert json.loads(response.body)["method"] == "sendMessage"
+        finally:
+            await application.stop()
+            await application.shutdown()
+            await bot._post_shutdown(application)
+            await api.stop()
+
+    asyncio.run(scenario())
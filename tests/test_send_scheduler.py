@@ -0,0 +1,105 @@
+"""SendScheduler: приоритеты, лимит на чат и повтор после RetryAfter."""
+import asyncio
+import time
+
+import pytest
+from telegram.error import RetryAfter
+
+from send_scheduler import SendScheduler
+
+
+async def _send(scheduler: SendScheduler, endpoint: str, chat_id=None, log: list | None = None,
+                callback=None):
+    async def ok():
+        if log is not None:
+            log.append((endpoint, chat_id))
+        return True
+
+    data = {"chat_id": chat_id} if chat_id is not None else {}
+    return await scheduler.process_request(callback or ok, (), {}, endpoint, data, None)
+
+
+def _run(scheduler: SendScheduler, scenario):
+    async def wrapper():
+        await scheduler.initialize()
+        try:
+            return await scenario()
+        finally:
+            await scheduler.shutdown()
+
+    return asyncio.run(wrapper())
+
+
+def test_interactive_requests_overtake_bulk() -> None:
+    scheduler = SendScheduler(global_rate=10)
+    log: list = []
+
+    async def scenario() -> None:
+        # Опустошаем общую корзину, чтобы следующие запросы встали в очередь
+        await asyncio.gather(*(_send(scheduler, "sendMessage") for _ in range(10)))
+        bulk = asyncio.create_task(_send(scheduler, "sendPhoto", log=log))
+        await asyncio.sleep(0)
+        interactive = asyncio.create_task(_send(scheduler, "sendMessage", log=log))
+        await asyncio.gather(bulk, interactive)
+
+    _run(scheduler, scenario)
+    assert log == [("sendMessage", None), ("sendPhoto", None)]
+
+
+def test_chat_budget_does_not_delay_other_chats() -> None:
+    scheduler = SendScheduler(global_rate=1000, chat_rate=5, chat_burst=2)
+    done: dict = {}
+
+    async def scenario() -> None:
+        started = time.monotonic()
+
+        async def send(key, chat_id):
+            await _send(scheduler, "sendMessage", chat_id)
+            done[key] = time.monotonic() - started
+
+        await asyncio.gather(*(send(f"a{i}", 1) for i in range(3)), send("b", 2))
+
+    _run(scheduler, scenario)
+    assert done["a0"] < 0.05 and done["a1"] < 0.05 and done["b"] < 0.05
+    # Третье сообщение в тот же чат ждёт токен: 1 / chat_rate
+    assert done["a2"] >= 0.15
+
+
+def test_retry_after_is_retried() -> None:
+    scheduler = SendScheduler(jitter=0)
+    calls = []
+
+    async def flaky():
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            raise RetryAfter(0)
+        return {"ok": True}
+
+    result = _run(scheduler, lambda: _send(scheduler, "sendMessage", 1, callback=flaky))
+    assert result == {"ok": True}
+    assert len(calls) == 2
+    assert scheduler.retries == 1
+
+
+def test_retry_after_gives_up_after_max_retries() -> None:
+    scheduler = SendScheduler(max_retries=1, jitter=0)
+
+    async def always_flooded():
+        raise RetryAfter(0)
+
+    with pytest.raises(RetryAfter):
+        _run(scheduler, lambda: _send(scheduler, "sendMessage", 1, callback=always_flooded))
+    assert scheduler.retries == 1
+
+
+def test_unlimited_endpoints_skip_the_queue() -> None:
+    scheduler = SendScheduler(global_rate=1, chat_rate=1, chat_burst=1)
+
+    async def scenario() -> float:
+        await _send(scheduler, "sendMessage", 1)
+        started = time.monotonic()
+        await asyncio.gather(*(_send(scheduler, "answerCallbackQuery", 1) for _ in range(20)))
+        return time.monotonic() - started
+
+    assert _run(scheduler, scenario) < 0.05
+    assert scheduler.granted == {1: 1, 2: 0, 3: 0}
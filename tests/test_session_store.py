@@ -0,0 +1,125 @@
+"""SqlitePersistence: ленивая подгрузка, запись только изменений, повтор после ошибки."""
+import asyncio
+import sqlite3
+import time
+from pathlib import Path
+
+import pytest
+
+from session_store import SqlitePersistence
+
+
+def _rows(db_path: Path) -> dict[int, str]:
+    with sqlite3.connect(db_path) as conn:
+        return dict(conn.execute("SELECT user_id, data FROM user_data").fetchall())
+
+
+async def _save(db_path: Path, user_id: int, data: dict) -> None:
+    persistence = SqlitePersistence(db_path)
+    await persistence.refresh_user_data(user_id, {})
+    await persistence.update_user_data(user_id, data)
+    await persistence.flush()
+
+
+def _count_writes(persistence: SqlitePersistence, monkeypatch: pytest.MonkeyPatch) -> list[dict]:
+    batches: list[dict] = []
+    write = persistence._write
+
+    def counting(users, *args, **kwargs):
+        batches.append(dict(users))
+        return write(users, *args, **kwargs)
+
+    monkeypatch.setattr(persistence, "_write", counting)
+    return batches
+
+
+def test_user_data_is_loaded_lazily(tmp_path: Path) -> None:
+    db_path = tmp_path / "sessions.sqlite3"
+
+    async def scenario() -> None:
+        await _save(db_path, 42, {"selected_categories": 5})
+        persistence = SqlitePersistence(db_path)
+        assert await persistence.get_user_data() == {}
+        assert not persistence.loaded(42)
+        user_data: dict = {}
+        await persistence.refresh_user_data(42, user_data)
+        assert user_data == {"selected_categories": 5}
+        assert persistence.loaded(42)
+        await persistence.flush()
+
+    asyncio.run(scenario())
+
+
+def test_only_changed_data_is_written(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    db_path = tmp_path / "sessions.sqlite3"
+
+    async def scenario() -> None:
+        await _save(db_path, 42, {"a": 1})
+        persistence = SqlitePersistence(db_path)
+        batches = _count_writes(persistence, monkeypatch)
+        await persistence.refresh_user_data(42, {})
+        await persistence.update_user_data(42, {"a": 1})
+        # Пользователь, чьи данные не подгружались, в базе не трогается
+        await persistence.update_user_data(7, {"b": 2})
+        await persistence.flush()
+        assert all(users == {} for users in batches)
+
+        persistence = SqlitePersistence(db_path)
+        batches = _count_writes(persistence, monkeypatch)
+        await persistence.refresh_user_data(42, {})
+        await persistence.update_user_data(42, {"a": 2})
+        await persistence.flush()
+        assert batches == [{42: '{"a":2}'}]
+
+    asyncio.run(scenario())
+    assert _rows(db_path) == {42: '{"a":2}'}
+
+
+def test_failed_write_is_retried(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    db_path = tmp_path / "sessions.sqlite3"
+
+    async def scenario() -> None:
+        persistence = SqlitePersistence(db_path)
+        write = persistence._write
+        failures = [sqlite3.OperationalError("database is locked")]
+
+        def flaky(*args, **kwargs):
+            if failures:
+                raise failures.pop()
+            return write(*args, **kwargs)
+
+        monkeypatch.setattr(persistence, "_write", flaky)
+        await persistence.refresh_user_data(42, {})
+        await persistence.update_user_data(42, {"a": 1})
+        await asyncio.sleep(0.1)
+        assert not failures
+        assert _rows(db_path) == {}
+        # Неудачная пачка вернулась в очередь и уходит со следующей записью
+        await persistence.flush()
+
+    asyncio.run(scenario())
+    assert _rows(db_path) == {42: '{"a":1}'}
+
+
+def test_drop_and_purge(tmp_path: Path) -> None:
+    db_path = tmp_path / "sessions.sqlite3"
+
+    async def scenario() -> None:
+        await _save(db_path, 1, {"a": 1})
+        await _save(db_path, 2, {"b": 2})
+        persistence = SqlitePersistence(db_path, ttl=0.05)
+        await persistence.refresh_user_data(1, {})
+        await persistence.drop_user_data(1)
+        assert not persistence.loaded(1)
+        await persistence.refresh_user_data(3, {})
+        await persistence.update_user_data(3, {"c": 3})
+        await asyncio.sleep(0.1)
+        assert _rows(db_path) == {2: '{"b":2}', 3: '{"c":3}'}
+
+        time.sleep(0.1)
+        assert persistence.expired() == [3]
+        await persistence.purge_expired()
+        assert _rows(db_path) == {}
+        await persistence.flush()
+
+    asyncio.run(scenario())
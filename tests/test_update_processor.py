@@ -0,0 +1,83 @@
+"""PerChatUpdateProcessor: порядок внутри чата, параллельность между чатами, общий лимит."""
+import asyncio
+from datetime import datetime, timezone
+
+from telegram import Chat, Message, Update
+
+from update_processor import PerChatUpdateProcessor
+
+
+def _update(update_id: int, chat_id: int) -> Update:
+    message = Message(update_id, datetime.now(timezone.utc), Chat(chat_id, Chat.PRIVATE))
+    return Update(update_id, message=message)
+
+
+def test_updates_of_one_chat_keep_order() -> None:
+    processor = PerChatUpdateProcessor(8)
+    finished: list[int] = []
+
+    async def handle(update_id: int, delay: float) -> None:
+        await asyncio.sleep(delay)
+        finished.append(update_id)
+
+    async def scenario() -> None:
+        # Первое обновление обрабатывается дольше остальных, но всё равно завершается первым
+        delays = [0.05, 0.0, 0.02, 0.0]
+        await asyncio.gather(*(
+            processor.process_update(_update(i, 1), handle(i, delay)) for i, delay in enumerate(delays)
+        ))
+
+    asyncio.run(scenario())
+    assert finished == [0, 1, 2, 3]
+
+
+def test_slow_chat_does_not_block_others() -> None:
+    processor = PerChatUpdateProcessor(8)
+    finished: list[int] = []
+
+    async def scenario() -> None:
+        release = asyncio.Event()
+
+        async def slow() -> None:
+            await release.wait()
+            finished.append(1)
+
+        async def fast() -> None:
+            finished.append(2)
+
+        slow_task = asyncio.create_task(processor.process_update(_update(1, 1), slow()))
+        await asyncio.wait_for(processor.process_update(_update(2, 2), fast()), timeout=1)
+        assert finished == [2]
+        release.set()
+        await slow_task
+
+    asyncio.run(scenario())
+    assert finished == [2, 1]
+
+
+def test_concurrency_limit_and_waiting_count() -> None:
+    processor = PerChatUpdateProcessor(2)
+    peak = 0
+
+    async def scenario() -> None:
+        release = asyncio.Event()
+
+        async def handle() -> None:
+            nonlocal peak
+            peak = max(peak, processor.active)
+            await release.wait()
+
+        tasks = [
+            asyncio.create_task(processor.process_update(_update(i, chat_id), handle()))
+            for i, chat_id in enumerate([1, 2, 3, 3, 4])
+        ]
+        await asyncio.sleep(0.05)
+        assert processor.active == 2
+        assert processor.waiting == 3
+        release.set()
+        await asyncio.gather(*tasks)
+        assert processor.active == 0
+        assert processor.waiting == 0
+
+    asyncio.run(scenario())
+    assert peak == 2
@@ -0,0 +1,141 @@
+"""WebhookHandler и serve_webhook против локальной заглушки Bot API, без сети."""
+import asyncio
+import json
+import os
+import signal
+import socket
+
+import pytest
+from telegram import Update
+from telegram.ext import Application, TypeHandler
+
+from bench.fake_bot_api import FakeBotApi
+from http_server import HttpRequest
+from webhook import SECRET_HEADER, WebhookConfig, WebhookHandler, serve_webhook
+
+TOKEN = "123456:TEST"
+SECRET = "s3cret"
+
+
+def _update(text: str, update_id: int = 1) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": 1,
+            "date": 0,
+            "chat": {"id": 42, "type": "private"},
+            "from": {"id": 42, "is_bot": False, "first_name": "Ann"},
+            "text": text,
+        },
+    }
+
+
+def _request(body: dict, path: str = "/hook", method: str = "POST", secret: str = SECRET) -> HttpRequest:
+    return HttpRequest(method, path, {}, {SECRET_HEADER: secret}, json.dumps(body).encode())
+
+
+def _inline_help(update) -> dict | None:
+    if update.message and update.message.text == "/help":
+        return {"method": "sendMessage", "chat_id": update.message.chat_id, "text": "Справка"}
+    return None
+
+
+def _handler(application: Application) -> WebhookHandler:
+    config = WebhookConfig(url="https://example.com/hook", path="/hook", secret_token=SECRET)
+    return WebhookHandler(application, config, _inline_help)
+
+
+@pytest.fixture
+def application() -> Application:
+    return Application.builder().token(TOKEN).updater(None).build()
+
+
+def test_wrong_secret_is_forbidden(application: Application) -> None:
+    response = asyncio.run(_handler(application)(_request(_update("hi"), secret="nope")))
+    assert response.status == 403
+    assert application.update_queue.empty()
+
+
+def test_unknown_path_and_method(application: Application) -> None:
+    handler = _handler(application)
+    assert asyncio.run(handler(_request(_update("hi"), path="/other"))).status == 404
+    assert asyncio.run(handler(_request(_update("hi"), method="GET"))).status == 405
+
+
+def test_inline_reply_in_response_body(application: Application) -> None:
+    response = asyncio.run(_handler(application)(_request(_update("/help"))))
+    assert response.status == 200
+    assert json.loads(response.body) == {"method": "sendMessage", "chat_id": 42, "text": "Справка"}
+    assert application.update_queue.empty()
+
+
+def test_other_updates_go_to_queue(application: Application) -> None:
+    response = asyncio.run(_handler(application)(_request(_update("хочу кухню", update_id=7))))
+    assert response.status == 200
+    assert response.body == b""
+    update = application.update_queue.get_nowait()
+    assert update.update_id == 7
+    assert update.message.text == "хочу кухню"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _connect(port: int) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+    for _ in range(100):
+        try:
+            return await asyncio.open_connection("127.0.0.1", port)
+        except ConnectionError:
+            await asyncio.sleep(0.05)
+    raise AssertionError("вебхук не начал слушать порт")
+
+
+async def _post_keep_alive(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, body: bytes) -> bytes:
+    writer.write(
+        b"POST /hook HTTP/1.1\r\nHost: localhost\r\n"
+        + f"{SECRET_HEADER}: {SECRET}\r\nContent-Length: {len(body)}\r\n\r\n".encode()
+        + body
+    )
+    await writer.drain()
+    status = await reader.readline()
+    while await reader.readline() not in (b"\r\n", b""):
+        pass
+    return status
+
+
+@pytest.mark.skipif(not hasattr(signal, "SIGTERM") or os.name == "nt", reason="нужны POSIX-сигналы")
+def test_serve_webhook_stops_with_idle_keep_alive_client() -> None:
+    async def scenario() -> None:
+        api = FakeBotApi()
+        await api.start()
+        try:
+            application = Application.builder().token(TOKEN).base_url(api.base_url).updater(None).build()
+            received: list[int] = []
+
+            async def collect(update, context) -> None:
+                received.append(update.update_id)
+
+            application.add_handler(TypeHandler(Update, collect))
+
+            port = _free_port()
+            config = WebhookConfig(url="https://example.com/hook", listen="127.0.0.1", port=port,
+                                   path="/hook", secret_token=SECRET, drain_timeout=1)
+            server = asyncio.create_task(serve_webhook(application, config))
+            reader, writer = await _connect(port)
+            status = await _post_keep_alive(reader, writer, json.dumps(_update("привет", 5)).encode())
+            assert status.startswith(b"HTTP/1.1 200")
+            assert api.calls["setWebhook"] == 1
+
+            # Соединение остаётся открытым, как у Telegram
+            os.kill(os.getpid(), signal.SIGTERM)
+            await asyncio.wait_for(server, timeout=5)
+            assert received == [5]
+            assert await reader.read() == b""
+            writer.close()
+        finally:
+            await api.stop()
+
+    asyncio.run(scenario())
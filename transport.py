@@ -0,0 +1,131 @@
+"""HTTP-клиенты бота: отдельные пулы соединений под разные виды запросов.
+
+По умолчанию у PTB один пул на все вызовы Bot API, и загрузка альбома
+занимает соединения, которые нужны быстрым `answerCallbackQuery` и
+`sendMessage`. Здесь запросы с файлами уходят в свой небольшой пул со своими
+таймаутами, а остальные — в пул для интерактивных ответов. `getUpdates`
+PTB и так ходит через отдельный клиент (`get_updates_request`).
+
+Файлы отдаются в httpx открытым дескриптором и читаются по частям во время
+отправки (см. `_upload()` в bot.py), а не целиком в память.
+"""
+import importlib.util
+import logging
+from dataclasses import dataclass
+from ssl import SSLContext
+from typing import Any
+
+import httpx
+from telegram.request import BaseRequest, HTTPXRequest, RequestData
+
+# «Значение не задано» для таймаутов: тогда берётся таймаут пула
+_DEFAULT = BaseRequest.DEFAULT_NONE
+
+# HTTP/2 в httpx требует пакета h2 (pip install "httpx[http2]")
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+@dataclass(frozen=True, slots=True)
+class PoolConfig:
+    size: int
+    # Таймаут на чтение ответа и на отправку тела запроса, с
+    timeout: float
+    connect_timeout: float = 5.0
+    # Сколько ждать свободного соединения из пула, с
+    pool_timeout: float = 1.0
+    # Сколько держать простаивающее соединение открытым, с
+    keepalive: float = 30.0
+    http2: bool = False
+
+
+def http_request(config: PoolConfig, tls: SSLContext) -> HTTPXRequest:
+    http2 = config.http2
+    if http2 and not HTTP2_AVAILABLE:
+        logging.warning("HTTP/2 недоступен (нет пакета h2), используется HTTP/1.1")
+        http2 = False
+    return HTTPXRequest(
+        connection_pool_size=config.size,
+        read_timeout=config.timeout,
+        write_timeout=config.timeout,
+        # PTB по умолчанию даёт запросам с файлами отдельный таймаут записи — у нас он общий на пул
+        media_write_timeout=config.timeout,
+        connect_timeout=config.connect_timeout,
+        pool_timeout=config.pool_timeout,
+        http_version="2" if http2 else "1.1",
+        httpx_kwargs={
+            "verify": tls,
+            "limits": httpx.Limits(
+                max_connections=config.size,
+                max_keepalive_connections=config.size,
+                keepalive_expiry=config.keepalive,
+            ),
+        },
+    )
+
+
+class RoutingRequest(BaseRequest):
+    """Отправляет запросы с файлами в `uploads`, остальные — в `interactive`."""
+
+    __slots__ = ("interactive", "uploads")
+
+    def __init__(self, interactive: BaseRequest, uploads: BaseRequest) -> None:
+        self.interactive = interactive
+        self.uploads = uploads
+
+    @property
+    def read_timeout(self) -> float | None:
+        return self.interactive.read_timeout
+
+    async def initialize(self) -> None:
+        await self.interactive.initialize()
+        await self.uploads.initialize()
+
+    async def shutdown(self) -> None:
+        await self.interactive.shutdown()
+        await self.uploads.shutdown()
+
+    async def post(
+        self,
+        url: str,
+        request_data: RequestData | None = None,
+        read_timeout: Any = _DEFAULT,
+        write_timeout: Any = _DEFAULT,
+        connect_timeout: Any = _DEFAULT,
+        pool_timeout: Any = _DEFAULT,
+    ) -> Any:
+        target = self.uploads if request_data is not None and request_data.contains_files else self.interactive
+        return await target.post(
+            url, request_data, read_timeout=read_timeout, write_timeout=write_timeout,
+            connect_timeout=connect_timeout, pool_timeout=pool_timeout,
+        )
+
+    async def retrieve(
+        self,
+        url: str,
+        read_timeout: Any = _DEFAULT,
+        write_timeout: Any = _DEFAULT,
+        connect_timeout: Any = _DEFAULT,
+        pool_timeout: Any = _DEFAULT,
+    ) -> bytes:
+        # Скачивание файлов — тоже объёмный трафик
+        return await self.uploads.retrieve(
+            url, read_timeout=read_timeout, write_timeout=write_timeout,
+            connect_timeout=connect_timeout, pool_timeout=pool_timeout,
+        )
+
+    async def do_request(
+        self,
+        url: str,
+        method: str,
+        request_data: RequestData | None = None,
+        read_timeout: Any = _DEFAULT,
+        write_timeout: Any = _DEFAULT,
+        connect_timeout: Any = _DEFAULT,
+        pool_timeout: Any = _DEFAULT,
+    ) -> tuple[int, bytes]:
+        # post() и retrieve() уже отданы нужному пулу; сюда попадают только прямые вызовы
+        target = self.uploads if request_data is not None and request_data.contains_files else self.interactive
+        return await target.do_request(
+            url, method, request_data, read_timeout=read_timeout, write_timeout=write_timeout,
+            connect_timeout=connect_timeout, pool_timeout=pool_timeout,
+        )
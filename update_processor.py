@@ -0,0 +1,110 @@
+"""Параллельная обработка обновлений с сохранением порядка внутри чата.
+
+Обновления разных чатов обрабатываются одновременно (не больше
+`max_concurrent_updates` сразу), а обновления одного чата — строго по очереди.
+Так долгая отправка альбомов одному клиенту не задерживает `/start` у
+остальных, а нажатия «категория» и «Готово» одного пользователя не
+перемешиваются при работе с `context.user_data`.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Hashable
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+from logging_setup import update_context
+
+# Базовый класс берёт свой семафор раньше, чем мы узнаём чат. Будь он
+# ограничен, очередь из обновлений одного активного чата могла бы занять все
+# слоты и снова заблокировать остальных. Поэтому базовый семафор делаем
+# «бесконечным», а общий лимит проверяем сами — уже после замка чата.
+_UNBOUNDED = 1 << 30
+
+
+def _chat_key(update: object) -> Hashable | None:
+    if not isinstance(update, Update):
+        return None
+    if update.effective_chat:
+        return update.effective_chat.id
+    if update.effective_user:
+        return ("user", update.effective_user.id)
+    return None
+
+
+class _ChatLock:
+    __slots__ = ("lock", "users")
+
+    def __init__(self) -> None:
+        self.lock = asyncio.Lock()
+        self.users = 0
+
+
+class PerChatUpdateProcessor(BaseUpdateProcessor):
+    def __init__(self, max_concurrent_updates: int) -> None:
+        if max_concurrent_updates < 1:
+            raise ValueError("`max_concurrent_updates` must be a positive integer!")
+        super().__init__(_UNBOUNDED)
+        self.limit = max_concurrent_updates
+        self._slots = asyncio.Semaphore(max_concurrent_updates)
+        self._chats: dict[Hashable, _ChatLock] = {}
+        # Обновления, принятые процессором: ждут замка чата или слота либо уже обрабатываются
+        self._accepted = 0
+        self.active = 0
+        # Необязательный наблюдатель: (update, начало обработки, конец) по time.perf_counter()
+        self.on_processed: Callable[[object, float, float], None] | None = None
+
+    @property
+    def waiting(self) -> int:
+        """Сколько обновлений ждёт своей очереди.
+
+        PTB передаёт обновления сюда сразу (базовый семафор не ограничен), так
+        что настоящая очередь — здесь, а не в `Application.update_queue`.
+        """
+        return self._accepted - self.active
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        self._accepted += 1
+        try:
+            await self._process(update, coroutine)
+        finally:
+            self._accepted -= 1
+
+    async def _process(self, update: object, coroutine: Awaitable[Any]) -> None:
+        key = _chat_key(update)
+        if key is None:
+            await self._run(update, coroutine)
+            return
+        chat = self._chats.get(key)
+        if chat is None:
+            chat = self._chats[key] = _ChatLock()
+        chat.users += 1
+        try:
+            # asyncio.Lock будит ожидающих в порядке очереди — порядок обновлений сохраняется
+            async with chat.lock:
+                await self._run(update, coroutine)
+        finally:
+            chat.users -= 1
+            if chat.users == 0:
+                del self._chats[key]
+
+    async def _run(self, update: object, coroutine: Awaitable[Any]) -> None:
+        async with self._slots:
+            self.active += 1
+            started = time.perf_counter()
+            try:
+                # Записи лога во время обработки получают update_id, chat_id и длительность
+                with update_context(update):
+                    await coroutine
+                    logging.debug("Обновление обработано")
+            finally:
+                self.active -= 1
+                if self.on_processed is not None:
+                    self.on_processed(update, started, time.perf_counter())
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
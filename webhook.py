@@ -0,0 +1,145 @@
+"""Режим вебхука — альтернатива `Application.run_polling()`.
+
+Telegram сам присылает обновления на встроенный HTTP-сервер, так что нет
+лишнего круга long-poll на каждое обновление. Простые команды можно ответить
+прямо в теле ответа на вебхук (Telegram выполнит метод сам) — это экономит
+исходящий запрос к Bot API. Остальное уходит в обычную очередь `Application`.
+"""
+import argparse
+import asyncio
+import hmac
+import json
+import logging
+import os
+import secrets
+import signal
+from dataclasses import dataclass
+from typing import Any, Callable
+from urllib.parse import urlsplit
+
+from telegram import Update
+from telegram.ext import Application
+
+from config import CONFIG_ERRORS, env_number
+from http_server import HttpRequest, HttpResponse, HttpServer
+
+# Ответ, который можно вернуть в теле вебхука: {"method": "sendMessage", ...}
+InlineReply = Callable[[Update], dict[str, Any] | None]
+
+SECRET_HEADER = "x-telegram-bot-api-secret-token"
+
+
+@dataclass
+class WebhookConfig:
+    url: str
+    listen: str = "0.0.0.0"
+    port: int = 8443
+    path: str = "/"
+    secret_token: str = ""
+    drain_timeout: float = 10.0
+
+    @classmethod
+    def from_env(cls) -> "WebhookConfig":
+        """Настройки из WEBHOOK_*; ошибки копятся в `config.CONFIG_ERRORS` (см. check_config)."""
+        url = os.getenv("WEBHOOK_URL", "")
+        if not url:
+            CONFIG_ERRORS.append("Для режима webhook нужна переменная WEBHOOK_URL (публичный https-адрес бота)")
+        port = env_number("WEBHOOK_PORT", "8443", int)
+        if not 0 <= port <= 65535:
+            CONFIG_ERRORS.append(f"WEBHOOK_PORT={port}: порт должен быть от 0 до 65535")
+        return cls(
+            url=url,
+            listen=os.getenv("WEBHOOK_LISTEN", "0.0.0.0"),
+            port=port,
+            path=os.getenv("WEBHOOK_PATH") or urlsplit(url).path or "/",
+            # Без заданного секрета генерируем случайный: set_webhook всё равно вызывается при старте
+            secret_token=os.getenv("WEBHOOK_SECRET") or secrets.token_urlsafe(32),
+            drain_timeout=env_number("WEBHOOK_DRAIN_TIMEOUT", "10"),
+        )
+
+
+def parse_mode(argv: list[str] | None = None) -> str:
+    """Режим работы: `--mode` из командной строки или BOT_MODE из окружения."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mode", choices=("polling", "webhook"), default=os.getenv("BOT_MODE", "polling"))
+    return parser.parse_args(argv).mode
+
+
+class WebhookHandler:
+    """Принимает обновления от Telegram и раскладывает их по очереди приложения."""
+
+    def __init__(self, application: Application, config: WebhookConfig,
+                 inline_reply: InlineReply | None = None) -> None:
+        self.application = application
+        self.config = config
+        self.inline_reply = inline_reply
+        self._secret = config.secret_token.encode()
+
+    async def __call__(self, request: HttpRequest) -> HttpResponse:
+        if request.path != self.config.path:
+            return HttpResponse(404)
+        if request.method != "POST":
+            return HttpResponse(405)
+        token = request.headers.get(SECRET_HEADER, "").encode()
+        if not hmac.compare_digest(token, self._secret):
+            return HttpResponse(403)
+        try:
+            update = Update.de_json(json.loads(request.body), self.application.bot)
+        except Exception:  # noqa: BLE001 - битое тело: Telegram не должен ретраить
+            logging.warning("Некорректное тело вебхука")
+            return HttpResponse(400)
+
+        if self.inline_reply is not None:
+            reply = self.inline_reply(update)
+            if reply is not None:
+                return HttpResponse(200, json.dumps(reply, ensure_ascii=False).encode())
+        await self.application.update_queue.put(update)
+        return HttpResponse(200)
+
+
+async def serve_webhook(application: Application, config: WebhookConfig,
+                        inline_reply: InlineReply | None = None) -> None:
+    """Жизненный цикл как у run_polling, только обновления приходят по HTTP.
+
+    На SIGINT/SIGTERM сервер перестаёт принимать соединения, дожидается
+    запросов в обработке, после чего `Application.stop()` дорабатывает очередь.
+    Вебхук при остановке не удаляется: во время выкладки Telegram просто
+    повторит доставку на новый экземпляр.
+    """
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:  # Windows
+            pass
+
+    server = HttpServer(WebhookHandler(application, config, inline_reply), config.listen, config.port)
+    await application.initialize()
+    try:
+        if application.post_init:
+            await application.post_init(application)
+        await application.bot.set_webhook(
+            url=config.url,
+            secret_token=config.secret_token,
+            allowed_updates=Update.ALL_TYPES,
+        )
+        await application.start()
+        await server.start()
+        logging.info("Вебхук слушает %s:%s%s", config.listen, config.port, config.path)
+        await stop.wait()
+    finally:
+        logging.info("Остановка: дожидаемся обработки принятых обновлений")
+        await server.stop(timeout=config.drain_timeout)
+        if application.running:
+            await application.stop()
+        if application.post_stop:
+            await application.post_stop(application)
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
+
+
+def run_webhook(application: Application, config: WebhookConfig,
+                inline_reply: InlineReply | None = None) -> None:
+    asyncio.run(serve_webhook(application, config, inline_reply))